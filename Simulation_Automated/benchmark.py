@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from itertools import product
+import numpy as np
+from openpyxl import Workbook, load_workbook
+import engine
+import events
+import frontier
+import tiled
+from landscape import cached_landscape, generate_landscape
+from result_sinks import RESULT_COLUMNS, export_to_excel, open_result_sink, result_sinks
+from seeds import landscape_rng
+from sweep import run_sweep
+
+# Performance benchmarks on fixed seeds and landscapes, written as JSON so runs on different
+# commits can be compared. Like cli.py this only imports NumPy, SciPy and the sweep modules.
+#
+#   python benchmark.py --output before.json
+#   python benchmark.py --output after.json --compare before.json
+#   python benchmark.py --quick --suites step,sinks
+
+SEED = 20240601
+GRID_SIZES = [100, 500, 1000, 2000, 4000]
+QUICK_GRID_SIZES = [100, 500, 1000]
+FIRE_DENSITIES = [0.001, 0.01, 0.1]  # Fraction of the fuel cells burning when timing starts
+STEP_PARAMETERS = dict(humidity=0.2, precipitation_strength=0.3, wind_strength=0.5, drying_effect=0.5)
+STEPS_PER_REPEAT = 5
+SWEEP_VALUES = [0, 0.5, 1]
+SWEEP_GRID_SIZE = 100
+
+def timed(function, repeats):
+    # Median wall time of repeats calls of function(), which returns the seconds to count
+    # (so it can leave its own setup out)
+    return statistics.median(function() for _ in range(repeats))
+
+def burning_landscape(size, density):
+    # The landscape of SEED with a fixed random share of its fuel set alight, timers spread over 1-8
+    forest, _, burn_timers = generate_landscape(size, size, landscape_rng(SEED))
+    rng = np.random.default_rng(SEED)
+    fuel = np.flatnonzero((forest == 1) | (forest == 6))
+    lit = rng.choice(fuel, size=max(1, int(density * fuel.size)), replace=False)
+    forest.reshape(-1)[lit] = 2
+    burn_timers.reshape(-1)[lit] = rng.integers(1, 9, lit.size)
+    return forest, burn_timers
+
+def time_vectorized(forest, burn_timers):
+    # vectorized_step updates its arrays in place, so it gets copies of the shared landscape
+    forest, burn_timers = forest.copy(), burn_timers.copy()
+    rng = np.random.default_rng(SEED)
+    moisture_map = np.zeros(forest.shape, dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(STEPS_PER_REPEAT):
+        forest, moisture_map, burn_timers = engine.vectorized_step(
+            forest, moisture_map, burn_timers, STEP_PARAMETERS["humidity"], STEP_PARAMETERS["precipitation_strength"],
+            STEP_PARAMETERS["wind_strength"], STEP_PARAMETERS["drying_effect"], False, rng)
+    return time.perf_counter() - start
+
+def time_compact(forest, burn_timers):
+    simulation = engine.CompactSimulation(forest, burn_timers, rng=np.random.default_rng(SEED), **STEP_PARAMETERS)
+    start = time.perf_counter()
+    for _ in range(STEPS_PER_REPEAT):
+        simulation.step(False)
+    return time.perf_counter() - start
+
+def time_frontier(forest, burn_timers):
+    simulation = frontier.FrontierSimulation(forest.copy(), burn_timers, rng=np.random.default_rng(SEED),
+                                             **STEP_PARAMETERS)
+    start = time.perf_counter()
+    for _ in range(STEPS_PER_REPEAT):
+        simulation.step(False)
+    return time.perf_counter() - start
+
+def time_event(forest, burn_timers):
+    simulation = events.EventSimulation(forest.copy(), burn_timers, rng=np.random.default_rng(SEED), **STEP_PARAMETERS)
+    start = time.perf_counter()
+    for _ in range(STEPS_PER_REPEAT):
+        simulation.step(False)
+    return time.perf_counter() - start
+
+def time_tiled(forest, burn_timers):
+    scratch = tempfile.mkdtemp(prefix="benchmark-")
+    try:
+        grid = tiled.TiledGrid.create(scratch, forest, burn_timers)
+        simulation = tiled.TiledSimulation(grid, draw_key=SEED, **STEP_PARAMETERS)
+        start = time.perf_counter()
+        for _ in range(STEPS_PER_REPEAT):
+            simulation.step(False)
+        seconds = time.perf_counter() - start
+        simulation.close()
+        return seconds
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+step_timers = {"vectorized": time_vectorized, "compact": time_compact, "frontier": time_frontier, "event": time_event,
+               "tiled": time_tiled}
+
+def step_suite(sizes, repeats, engines):
+    # Steps per second of each engine by grid size and fire density
+    for size, density in product(sizes, FIRE_DENSITIES):
+        forest, burn_timers = burning_landscape(size, density)
+        for name in engines:
+            seconds = timed(lambda: step_timers[name](forest, burn_timers), repeats) / STEPS_PER_REPEAT
+            yield dict(suite="step", name=name, params=dict(size=size, density=density), seconds=seconds,
+                       rate=1 / seconds, unit="steps/s")
+
+def landscape_suite(sizes, repeats):
+    # Generation in memory, and into / out of the memory-mapped cache
+    for size in sizes:
+        def generate():
+            start = time.perf_counter()
+            generate_landscape(size, size, landscape_rng(SEED))
+            return time.perf_counter() - start
+        seconds = timed(generate, repeats)
+        yield dict(suite="landscape", name="generate", params=dict(size=size), seconds=seconds,
+                   rate=size * size / seconds, unit="cells/s")
+
+        cache = tempfile.mkdtemp(prefix="benchmark-")
+        def cold():
+            shutil.rmtree(cache, ignore_errors=True)
+            start = time.perf_counter()
+            cached_landscape(size, size, SEED, cache)
+            return time.perf_counter() - start
+        def warm():
+            start = time.perf_counter()
+            cached_landscape(size, size, SEED, cache)
+            return time.perf_counter() - start
+        try:
+            # cold runs first, so the entry warm opens is always there
+            for name, load in (("cache_cold", cold), ("cache_warm", warm)):
+                seconds = timed(load, repeats)
+                yield dict(suite="landscape", name=name, params=dict(size=size), seconds=seconds,
+                           rate=size * size / seconds, unit="cells/s")
+        finally:
+            shutil.rmtree(cache, ignore_errors=True)
+
+def sweep_suite(worker_counts, repeats, engines):
+    # End-to-end sweep throughput over every combination of SWEEP_VALUES, without deduplication
+    forest, moisture_map, burn_timers = generate_landscape(SWEEP_GRID_SIZE, SWEEP_GRID_SIZE, landscape_rng(SEED))
+    combinations = list(product(SWEEP_VALUES, repeat=4))
+    for name, workers in product(engines, worker_counts):
+        def sweep():
+            start = time.perf_counter()
+            for _ in run_sweep(forest, moisture_map, burn_timers, combinations, workers=workers, progress=None,
+                               engine=name, master_seed=SEED):
+                pass
+            return time.perf_counter() - start
+        seconds = timed(sweep, repeats)
+        yield dict(suite="sweep", name=name, params=dict(workers=workers, size=SWEEP_GRID_SIZE, runs=len(combinations)),
+                   seconds=seconds, rate=len(combinations) / seconds, unit="runs/s")
+
+def benchmark_rows(count):
+    rng = np.random.default_rng(SEED)
+    return np.column_stack([rng.random((count, 5)), rng.integers(0, 10000, (count, 3))]).tolist()
+
+def save_row_to_workbook(filename, row):
+    # The I/O of main.save_to_excel: load the whole workbook, append one row, save it again
+    if not os.path.exists(filename):
+        wb = Workbook()
+        wb.active.append(RESULT_COLUMNS)
+        wb.save(filename)
+    wb = load_workbook(filename)
+    wb.active.append(row)
+    wb.save(filename)
+
+def time_sink(kind, basename, rows):
+    with open_result_sink(kind, basename) as sink:
+        start = time.perf_counter()
+        for row in rows:
+            sink.write(row)
+        sink.flush()
+        return time.perf_counter() - start
+
+def time_export(basename, rows):
+    with open_result_sink("csv", basename) as sink:
+        for row in rows:
+            sink.write(row)
+        start = time.perf_counter()
+        export_to_excel(sink, basename + ".xlsx")
+        return time.perf_counter() - start
+
+def time_workbook_rows(basename, rows):
+    start = time.perf_counter()
+    for row in rows:
+        save_row_to_workbook(basename + ".xlsx", row)
+    return time.perf_counter() - start
+
+def sinks_suite(row_count, workbook_rows, repeats):
+    # Result-writer throughput: each streaming sink, the final Excel export, and the per-row workbook rewrite
+    rows = benchmark_rows(row_count)
+    writers = {kind: (row_count, lambda basename, kind=kind: time_sink(kind, basename, rows)) for kind in sorted(result_sinks)}
+    writers["export_to_excel"] = (row_count, lambda basename: time_export(basename, rows))
+    writers["save_to_excel"] = (workbook_rows, lambda basename: time_workbook_rows(basename, rows[:workbook_rows]))
+    for kind, (count, writer) in writers.items():
+        def write():
+            directory = tempfile.mkdtemp(prefix="benchmark-")
+            try:
+                return writer(os.path.join(directory, "results"))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+        seconds = timed(write, repeats)
+        yield dict(suite="sinks", name=kind, params=dict(rows=count), seconds=seconds, rate=count / seconds,
+                   unit="rows/s")
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return dict(commit=commit, timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"), seed=SEED,
+                python=platform.python_version(), numpy=np.__version__, platform=platform.platform(),
+                processor=platform.processor(), cpu_count=os.cpu_count())
+
+def result_key(result):
+    return result["suite"], result["name"], json.dumps(result["params"], sort_keys=True)
+
+def compare(results, baseline, threshold):
+    # Print each result's speed relative to the matching baseline result; return the regressions
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        speedup = old["seconds"] / result["seconds"]
+        flag = ""
+        if speedup < 1 - threshold:
+            flag = "  REGRESSION"
+            regressions.append(result)
+        print(f"{result['suite']:<10}{result['name']:<16}{json.dumps(result['params']):<50}"
+              f"{old['seconds']:>12.6f}s -> {result['seconds']:>12.6f}s  x{speedup:.2f}{flag}")
+    return regressions
+
+def parse_list(text, kind=str):
+    return [kind(value) for value in text.split(",") if value.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the step engines, sweep runner and result writers.")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file to write (default benchmark.json)")
+    parser.add_argument("--suites", type=parse_list, default=["step", "landscape", "sweep", "sinks"],
+                        help="Comma-separated suites to run (default step,landscape,sweep,sinks)")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"Grids up to {QUICK_GRID_SIZES[-1]}², one repeat and fewer rows, for a fast check")
+    parser.add_argument("--sizes", type=lambda text: parse_list(text, int),
+                        help=f"Grid edges of the step and landscape suites (default {','.join(map(str, GRID_SIZES))})")
+    parser.add_argument("--engines", type=parse_list, default=list(step_timers),
+                        help="Step engines to time (default vectorized,compact,frontier,event,tiled)")
+    parser.add_argument("--workers", type=lambda text: parse_list(text, int),
+                        help="Worker counts of the sweep suite (default 1, 2, 4, ... up to all cores)")
+    parser.add_argument("--repeats", type=int, help="Timed repeats per case, of which the median is kept (default 3)")
+    parser.add_argument("--compare", help="Earlier benchmark JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Slowdown that counts as a regression in --compare (default 0.1, i.e. 10%%)")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_GRID_SIZES if args.quick else GRID_SIZES)
+    repeats = args.repeats or (1 if args.quick else 3)
+    workers = args.workers or sorted({1, os.cpu_count()} | {2 ** power for power in range(1, 8)
+                                                              if 2 ** power < os.cpu_count()})
+    suites = {
+        "step": lambda: step_suite(sizes, repeats, args.engines),
+        "landscape": lambda: landscape_suite(sizes, repeats),
+        "sweep": lambda: sweep_suite(workers, repeats, ["ensemble", "frontier"]),
+        "sinks": lambda: sinks_suite(10000 if args.quick else 100000, 10 if args.quick else 50, repeats),
+    }
+    unknown = set(args.suites) - set(suites)
+    if unknown:
+        parser.error(f"unknown suites {', '.join(sorted(unknown))}; choose from {', '.join(suites)}")
+
+    results = []
+    for suite in args.suites:
+        for result in suites[suite]():
+            print(f"{result['suite']:<10}{result['name']:<16}{json.dumps(result['params']):<50}"
+                  f"{result['seconds']:>12.6f}s {result['rate']:>14.1f} {result['unit']}")
+            results.append(result)
+
+    report = dict(environment=environment(), results=results)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Benchmark results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} benchmark(s) slower than {args.compare} by more than "
+                             f"{args.threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from landscape import cache_entry, load_cache_entry, row_bands
+
+# Durable sweep state next to the results, so a killed sweep can be resumed where it stopped.
+# The result sink itself is the record of finished combinations (a row is only counted once it
+# has been flushed), and the manifest pins everything a finished row depends on: the master
+# seed, the landscape and the parameter grid. Rerunning with the same seeds reproduces any row
+# that was lost in a buffer, bit for bit.
+
+def write_atomically(path, write):
+    # Write through a temporary file and rename it over path, so a crash leaves the old or the new file
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+def landscape_fingerprint(forest, moisture_map, burn_timers):
+    # Hashed band by band, like count_trees, so a memory-mapped landscape is streamed rather than
+    # copied; the bands of a C-ordered array concatenate to its tobytes(), so the digest is the same
+    digest = hashlib.sha256()
+    for array in (forest, moisture_map, burn_timers):
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        for start, stop in row_bands(*array.shape):
+            digest.update(np.ascontiguousarray(array[start:stop]).data)
+    return digest.hexdigest()
+
+def grid_fingerprint(combinations):
+    # Values are compared as floats, so 0 and 0.0 in the grid are the same combination
+    grid = json.dumps([[float(value) for value in combination] for combination in combinations])
+    return hashlib.sha256(grid.encode()).hexdigest()
+
+def completed_indices(rows, combinations):
+    # Indices of the combinations that already have a row; the first four columns of a result
+    # or replica row are its (humidity, precipitation_strength, precipitation_chance, wind_strength)
+    pending = {}
+    for index, combination in enumerate(combinations):
+        pending.setdefault(tuple(float(value) for value in combination), []).append(index)
+    completed = set()
+    for row in rows:
+        indices = pending.get(tuple(float(value) for value in row[:4]))
+        if indices:
+            completed.add(indices.pop(0))
+    return completed
+
+class RunSnapshot:
+    # Periodic on-disk copy of one in-flight simulation (its state arrays, step count and generator
+    # state), so a long run that is killed restarts from its last snapshot instead of step 0
+    def __init__(self, path, seed, interval=300.0):
+        self.path = path
+        self.seed = seed
+        self.interval = interval
+        self.last_saved = time.monotonic()
+
+    def due(self):
+        return time.monotonic() - self.last_saved >= self.interval
+
+    def identity(self):
+        return json.dumps([str(self.seed.entropy), list(self.seed.spawn_key)])
+
+    def save(self, rng, steps_taken, **arrays):
+        state = json.dumps(rng.bit_generator.state)
+        write_atomically(self.path, lambda file: np.savez(file, identity=self.identity(), rng_state=state,
+                                                          steps_taken=steps_taken, **arrays))
+        self.last_saved = time.monotonic()
+
+    def load(self, rng):
+        # Return (steps_taken, arrays) and rewind rng to the snapshot, or None when there is none for this run
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path) as snapshot:
+            if str(snapshot["identity"]) != self.identity():
+                return None
+            rng.bit_generator.state = json.loads(str(snapshot["rng_state"]))
+            arrays = {name: snapshot[name] for name in snapshot.files
+                      if name not in ("identity", "rng_state", "steps_taken")}
+            return int(snapshot["steps_taken"]), arrays
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class RunSnapshots:
+    # Snapshot directory of one sweep; runs are keyed by their SeedSequence spawn key, which is
+    # unique per (combination, replica) whatever chunk, round or worker runs them
+    def __init__(self, directory, interval=300.0):
+        self.directory = directory
+        self.interval = interval
+
+    def for_run(self, seed):
+        os.makedirs(self.directory, exist_ok=True)
+        name = "run_" + "_".join(str(part) for part in seed.spawn_key) + ".npz"
+        return RunSnapshot(os.path.join(self.directory, name), seed, self.interval)
+
+class SweepCheckpoint:
+    # basename.checkpoint.json holds the manifest and basename.landscape.npz the landscape itself,
+    # so a resume does not depend on regenerating the same landscape from the seed. A landscape
+    # memory-mapped from a landscape.cached_landscape entry is not copied: the manifest names the
+    # entry, which is never modified, and a resume maps it again.
+    def __init__(self, basename):
+        self.manifest_path = basename + ".checkpoint.json"
+        self.landscape_path = basename + ".landscape.npz"
+        self.snapshot_directory = basename + ".snapshots"
+        self.manifest = None
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self):
+        with open(self.manifest_path, encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        return self.manifest
+
+    def resumable(self):
+        # A checkpoint of a sweep that has not finished
+        return self.exists() and not self.read_manifest().get("complete", False)
+
+    def finish(self):
+        # Mark the sweep complete, so nothing offers to resume it, and drop its run snapshots
+        self.read_manifest()["complete"] = True
+        write_atomically(self.manifest_path, lambda file: file.write(json.dumps(self.manifest, indent=2).encode()))
+        shutil.rmtree(self.snapshot_directory, ignore_errors=True)
+
+    def start(self, forest, moisture_map, burn_timers, master_seed, combinations, settings):
+        entry = cache_entry(forest, moisture_map, burn_timers)
+        if entry is None:
+            write_atomically(self.landscape_path, lambda file: np.savez(file, forest=forest, moisture_map=moisture_map,
+                                                                        burn_timers=burn_timers))
+        self.manifest = {"master_seed": int(master_seed), "landscape_cache": entry,
+                         "landscape": landscape_fingerprint(forest, moisture_map, burn_timers),
+                         "grid": grid_fingerprint(combinations), "combinations": len(combinations),
+                         "settings": settings}
+        write_atomically(self.manifest_path, lambda file: file.write(json.dumps(self.manifest, indent=2).encode()))
+
+    def load(self):
+        # Return the checkpointed (forest, moisture_map, burn_timers, master_seed)
+        self.read_manifest()
+        source = self.manifest.get("landscape_cache")
+        if source is not None:
+            forest, moisture_map, burn_timers = load_cache_entry(source)
+        else:
+            source = self.landscape_path
+            with np.load(self.landscape_path) as landscape:
+                forest, moisture_map, burn_timers = landscape["forest"], landscape["moisture_map"], landscape["burn_timers"]
+        if landscape_fingerprint(forest, moisture_map, burn_timers) != self.manifest["landscape"]:
+            raise ValueError(f"{source} does not match the landscape in {self.manifest_path}.")
+        return forest, moisture_map, burn_timers, self.manifest["master_seed"]
+
+    def verify(self, combinations, settings):
+        # A resumed sweep must cover the same grid with the same result-affecting settings
+        if grid_fingerprint(combinations) != self.manifest["grid"]:
+            raise ValueError(f"The parameter grid differs from the one in {self.manifest_path}.")
+        if settings != self.manifest["settings"]:
+            raise ValueError(f"Sweep settings {settings} differ from {self.manifest['settings']} "
+                             f"in {self.manifest_path}.")
+
+    def snapshots(self, interval=300.0):
+        return RunSnapshots(self.snapshot_directory, interval)
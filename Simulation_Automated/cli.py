@@ -0,0 +1,211 @@
+import argparse
+import os
+import time
+from contextlib import contextmanager
+from itertools import product
+from checkpoint import SweepCheckpoint, completed_indices
+from landscape import cached_landscape, count_trees, generate_landscape
+from recorder import RunRecordings
+from seeds import landscape_rng, new_master_seed, simulation_seed
+from telemetry import Telemetry
+from result_sinks import result_sinks, open_result_sink, export_to_excel
+from result_store import ResultStore
+from sweep import run_sweep
+from planner import planned_seeds, run_planned_sweep
+from replicas import REPLICA_COLUMNS, run_adaptive_sweep
+
+# Headless entry point for batch sweeps: only NumPy, SciPy and the sweep modules are imported,
+# never tkinter or matplotlib.
+#
+#   python cli.py --rows 200 --cols 200 --values 0,0.5,1 --seed 7 --workers 32 --sink sqlite
+#   python cli.py --values 0,0.5,1 --sink sqlite --resume    # after the first run was killed
+
+DEFAULT_VALUES = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]
+
+def parse_values(text):
+    return [float(value) for value in text.split(",") if value.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a forest fire parameter sweep without the GUI.")
+    parser.add_argument("--rows", type=int, default=100, help="Grid rows (default 100)")
+    parser.add_argument("--cols", type=int, default=100, help="Grid columns (default 100)")
+    parser.add_argument("--values", type=parse_values, default=DEFAULT_VALUES,
+                        help="Comma-separated values used for every parameter (default 0,0.1,...,1)")
+    parser.add_argument("--humidity", type=parse_values, help="Values for humidity only")
+    parser.add_argument("--precipitation-strength", type=parse_values, help="Values for precipitation strength only")
+    parser.add_argument("--precipitation-chance", type=parse_values, help="Values for precipitation chance only")
+    parser.add_argument("--wind-strength", type=parse_values, help="Values for wind strength only")
+    parser.add_argument("--landscape-cache",
+                        help="Directory of generated landscapes, reused (memory-mapped) for the same size and seed")
+    parser.add_argument("--seed", type=int, help="Master seed for the landscape and every simulation (default: fresh entropy, printed)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: all cores)")
+    parser.add_argument("--engine", choices=["ensemble", "compact", "frontier", "event", "tiled"], default="ensemble",
+                        help="ensemble (stacked runs, best for small grids), compact (uint8 double-buffered), "
+                             "frontier (sparse, best for large grids), event (schedules burnouts and ignitions, "
+                             "best for large grids with slow fires) or tiled (out of core, for grids larger "
+                             "than memory; use with --landscape-cache)")
+    parser.add_argument("--tile-size", type=int, default=512, help="Tile edge of the tiled engine (default 512)")
+    parser.add_argument("--tile-threads", type=int, help="Threads stepping tiles per tiled run (default: all cores)")
+    parser.add_argument("--tile-directory", help="Where tiled runs keep their state (default: the temp directory)")
+    parser.add_argument("--ensemble-size", type=int, default=256, help="Runs stepped together per batch (default 256)")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="Simulate every combination instead of once per class of equivalent parameters")
+    parser.add_argument("--samples-per-class", type=int, default=1,
+                        help="Runs per equivalence class, spread over its member rows (default 1)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Run replicas per point until the mean %% burned is within --tolerance, "
+                             "writing one summary row per combination")
+    parser.add_argument("--min-replicas", type=int, default=10, help="Replicas before a point may stop (default 10)")
+    parser.add_argument("--max-replicas", type=int, default=200, help="Replica cap per point (default 200)")
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="Target 95%% interval half-width of %% burned, in percentage points (default 1.0)")
+    parser.add_argument("--sink", choices=sorted(result_sinks), default="csv", help="Result sink (default csv)")
+    parser.add_argument("--output", default="ForestFireSimulation", help="Result file name without extension")
+    parser.add_argument("--excel", help="Also convert the results to this .xlsx file at the end")
+    parser.add_argument("--store", metavar="PATH",
+                        help="Also append every run, with its seed and landscape fingerprint, to this SQLite "
+                             "result store (query it with result_store.py; shareable between sweeps)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the sweep checkpointed at --output, skipping combinations that already have a row")
+    parser.add_argument("--snapshot-interval", type=float,
+                        help="Snapshot in-flight compact/frontier/event runs every this many seconds so they resume mid-run")
+    parser.add_argument("--record", metavar="DIRECTORY",
+                        help="Record every run's per-step grid into DIRECTORY (compact, frontier and event engines); "
+                             "replay with recorder.py")
+    parser.add_argument("--keyframe-interval", type=int, default=64,
+                        help="Steps between full-grid keyframes of a recording (default 64)")
+    parser.add_argument("--telemetry", metavar="PATH",
+                        help="Append per-run counters, phase timings, throughput and ETA to this JSON-lines file")
+    parser.add_argument("--telemetry-interval", type=float, default=5.0,
+                        help="Seconds between progress and profile lines in the telemetry (default 5)")
+    parser.add_argument("--profile-interval", type=float,
+                        help="Sample the stack of every simulating process this often (seconds, e.g. 0.01) "
+                             "into the telemetry as collapsed stacks")
+    args = parser.parse_args(argv)
+    if args.record and args.engine not in ("compact", "frontier", "event"):
+        parser.error("--record needs --engine compact, frontier or event")
+    if args.store and args.adaptive:
+        parser.error("--store records single runs; --adaptive only yields per-point summaries")
+    return args
+
+def sweep_settings(args):
+    # Everything besides the seed, landscape and grid that changes a result row; workers and
+    # ensemble size do not, so a sweep may be resumed with different ones
+    settings = dict(engine=args.engine, deduplicate=not args.no_dedupe, sink=args.sink, adaptive=args.adaptive)
+    if args.adaptive:
+        settings.update(min_replicas=args.min_replicas, max_replicas=args.max_replicas, tolerance=args.tolerance)
+    elif not args.no_dedupe:
+        settings.update(samples_per_class=args.samples_per_class)
+    return settings
+
+def main(argv=None):
+    args = parse_args(argv)
+    combinations = list(product(args.humidity or args.values, args.precipitation_strength or args.values,
+                                args.precipitation_chance or args.values, args.wind_strength or args.values))
+    checkpoint = SweepCheckpoint(args.output)
+    resuming = args.resume and checkpoint.exists()
+    if resuming:
+        forest, moisture_map, burn_timers, master_seed = checkpoint.load()
+        checkpoint.verify(combinations, sweep_settings(args))
+        if args.seed is not None and args.seed != master_seed:
+            raise SystemExit(f"--seed {args.seed} differs from the checkpointed master seed {master_seed}.")
+        print(f"Resuming the sweep checkpointed in {checkpoint.manifest_path}")
+    else:
+        results_path = args.output + result_sinks[args.sink].extension
+        if checkpoint.exists() or os.path.exists(results_path):
+            raise SystemExit(f"{results_path} or {checkpoint.manifest_path} already exists; "
+                             "pass --resume to continue that sweep or choose another --output.")
+        master_seed = new_master_seed() if args.seed is None else args.seed
+        if args.landscape_cache:
+            forest, moisture_map, burn_timers = cached_landscape(args.rows, args.cols, master_seed, args.landscape_cache)
+        else:
+            forest, moisture_map, burn_timers = generate_landscape(args.rows, args.cols, landscape_rng(master_seed))
+    print(f"Master seed: {master_seed}")
+
+    total_trees = count_trees(forest)
+    if total_trees == 0:  # Safety check in case there are no trees
+        raise ValueError("No trees in the landscape to simulate burning.")
+    print(f"Total number of trees in the generated landscape: {total_trees}")
+    if not resuming:
+        checkpoint.start(forest, moisture_map, burn_timers, master_seed, combinations, sweep_settings(args))
+
+    started = time.perf_counter()
+    sweep_options = dict(workers=args.workers, ensemble_size=args.ensemble_size, engine=args.engine, master_seed=master_seed)
+    if args.engine == "tiled":
+        sweep_options["engine_options"] = dict(tile_size=args.tile_size, workers=args.tile_threads,
+                                               directory=args.tile_directory)
+    if args.snapshot_interval:
+        sweep_options["snapshots"] = checkpoint.snapshots(args.snapshot_interval)
+    if args.record:
+        sweep_options["recordings"] = RunRecordings(args.record, args.keyframe_interval)
+    telemetry = None
+    if args.telemetry:
+        telemetry = Telemetry(args.telemetry, args.telemetry_interval, args.profile_interval)
+        sweep_options.update(telemetry=telemetry, progress=telemetry.progress)
+    try:
+        save_sweep(args, forest, moisture_map, burn_timers, combinations, sweep_options, telemetry)
+        checkpoint.finish()
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+            print(f"Telemetry saved to {args.telemetry}")
+    print(f"Simulations for all parameter combinations completed in {time.perf_counter() - started:.1f}s.")
+
+@contextmanager
+def open_run_writer(args, forest, moisture_map, burn_timers, master_seed):
+    # A result_store.RunWriter for --store, closed with its store, or None
+    if not args.store:
+        yield None
+        return
+    with ResultStore(args.store) as store:
+        landscape = store.add_landscape(forest, moisture_map, burn_timers)
+        with store.writer(landscape, master_seed, args.engine, sweep=args.output) as writer:
+            yield writer
+
+def save_sweep(args, forest, moisture_map, burn_timers, combinations, sweep_options, telemetry=None):
+    # Run the sweep into the result sink; with telemetry, row writes and the Excel export are timed
+    # as its "io" and "export" phases
+    export = export_to_excel if telemetry is None else telemetry.timed("export", export_to_excel)
+    if args.adaptive:
+        with open_result_sink(args.sink, args.output, REPLICA_COLUMNS) as sink:
+            write = sink.write if telemetry is None else telemetry.timed("io", sink.write)
+            completed = completed_indices(sink.read_rows(), combinations)
+            print(f"Running {len(combinations) - len(completed)} of {len(combinations)} combinations "
+                  f"on {args.workers} worker(s)")
+            summaries = run_adaptive_sweep(forest, moisture_map, burn_timers, combinations, args.min_replicas,
+                                           args.max_replicas, args.tolerance, deduplicate=not args.no_dedupe,
+                                           completed=completed, **sweep_options)
+            for _, combination, stats in summaries:
+                write(stats.row(combination, 1.96))
+            if args.excel:
+                export(sink, args.excel)
+            print(f"Results saved to {sink.path}")
+        return
+
+    master_seed = sweep_options["master_seed"]
+    with open_result_sink(args.sink, args.output) as sink, \
+            open_run_writer(args, forest, moisture_map, burn_timers, master_seed) as runs:
+        write = sink.write if telemetry is None else telemetry.timed("io", sink.write)
+        completed = completed_indices(sink.read_rows(), combinations)
+        print(f"Running {len(combinations) - len(completed)} of {len(combinations)} combinations "
+              f"on {args.workers} worker(s)")
+        if args.no_dedupe:
+            seeds = [simulation_seed(master_seed, index) for index in range(len(combinations))]
+            results = run_sweep(forest, moisture_map, burn_timers, combinations, completed=completed, **sweep_options)
+        else:
+            seeds = planned_seeds(combinations, master_seed, args.samples_per_class)
+            results = run_planned_sweep(forest, moisture_map, burn_timers, combinations, args.samples_per_class,
+                                        completed=completed, **sweep_options)
+        for index, (humidity, precipitation_strength, precipitation_chance, wind_strength), cells, percentage, steps in results:
+            drying_effect = wind_strength
+            write([humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
+                   cells, percentage, steps])
+            if runs is not None:
+                runs.write(index, (humidity, precipitation_strength, precipitation_chance, wind_strength),
+                           cells, percentage, steps, seeds[index])
+        if args.excel:
+            export(sink, args.excel)
+        print(f"Results saved to {sink.path}")
+
+if __name__ == "__main__":
+    main()
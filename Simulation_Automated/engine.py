@@ -0,0 +1,270 @@
+import numpy as np
+
+# Neighbour offsets checked by spread_fire, in the same order
+NEIGHBOUR_OFFSETS = [(0, 1), (1, 0), (0, -1), (-1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def ignition_probability(humidity, precipitation_strength, wind_strength, drying_effect):
+    # Same formula as spread_fire, kept term for term so the float results match
+    reduction_factor = ((humidity + precipitation_strength) * 10) * 5
+    increase_factor = ((wind_strength + drying_effect) * 10) * 3
+    ignition_chance = 0.65 - (reduction_factor / 100) + (increase_factor / 100)
+    return max(0, min(1, ignition_chance))
+
+# SplitMix64 constants, for draws that are a pure function of (key, step, cell)
+SPLITMIX_GAMMA = 0x9E3779B97F4A7C15
+SPLITMIX_MULTIPLIERS = (0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+UINT64_MASK = (1 << 64) - 1
+
+def splitmix64(z):
+    # SplitMix64 finaliser on a Python int or a uint64 array (array arithmetic wraps modulo 2 ** 64)
+    first, second = SPLITMIX_MULTIPLIERS
+    if isinstance(z, int):
+        z = ((z ^ (z >> 30)) * first) & UINT64_MASK
+        z = ((z ^ (z >> 27)) * second) & UINT64_MASK
+        return z ^ (z >> 31)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(first)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(second)
+    return z ^ (z >> np.uint64(31))
+
+def new_draw_key(rng):
+    return int(rng.integers(0, 1 << 63))
+
+def cell_uniforms(draw_key, step, cells):
+    # Counter-based uniforms in [0, 1): the draw of a flat cell index depends only on (draw_key, step, cell),
+    # never on which other cells are drawn or in what order, so any partition of the grid
+    # (tiles, threads) draws exactly what a whole-grid step would
+    step_key = splitmix64((draw_key + (step + 1) * SPLITMIX_GAMMA) & UINT64_MASK)
+    z = splitmix64((np.asarray(cells, dtype=np.uint64) + np.uint64(1)) * np.uint64(SPLITMIX_GAMMA) + np.uint64(step_key))
+    return (z >> np.uint64(11)) * (1.0 / (1 << 53))
+
+def grid_neighbours(cells, rows, cols):
+    # Flat indices of every in-grid neighbour of the flat cells, one block per NEIGHBOUR_OFFSETS entry,
+    # together with the position in cells of the cell each one neighbours
+    cell_rows, cell_cols = np.divmod(cells, cols)
+    neighbours, sources = [], []
+    for dy, dx in NEIGHBOUR_OFFSETS:
+        inside = ((cell_rows + dy >= 0) & (cell_rows + dy < rows)
+                  & (cell_cols + dx >= 0) & (cell_cols + dx < cols))
+        neighbours.append(cells[inside] + (dy * cols + dx))
+        sources.append(np.flatnonzero(inside))
+    return np.concatenate(neighbours), np.concatenate(sources)
+
+def count_burning_neighbours(spreading_idx, shape):
+    # Scatter the spreading cells into a zero-padded mask and sum its 8 shifted neighbours,
+    # so cells outside the grid count as not burning. Leading axes (ensemble members)
+    # are carried through untouched.
+    *members, rows, cols = shape
+    padded = np.zeros((*members, rows + 2, cols + 2), dtype=np.uint8)
+    index = np.unravel_index(spreading_idx, shape)
+    padded[index[:-2] + (index[-2] + 1, index[-1] + 1)] = 1
+    # 3x3 box sum done separably (rows, then columns), minus the centre cell
+    row_sums = padded[..., :, :-2] + padded[..., :, 1:-1] + padded[..., :, 2:]
+    counts = row_sums[..., :-2, :] + row_sums[..., 1:-1, :] + row_sums[..., 2:, :]
+    counts -= padded[..., 1:-1, 1:-1]
+    return counts
+
+# Fires with fewer spreading cells than this fraction of the grid find their ignition candidates
+# from the spreading cells' neighbours instead of a whole-grid neighbour count. Both give the
+# candidates in ascending order with the same counts, so the draws and results do not depend on it.
+SPARSE_SPREADING_FRACTION = 1 / 100
+
+def vectorized_step(grid, moisture_map, burn_timers, humidity, precipitation_strength, wind_strength, drying_effect, rain_active, rng):
+    # One step of spread_fire on whole arrays. grid, moisture_map and burn_timers (C-contiguous)
+    # are updated in place and returned, so a step allocates only per burning or candidate cell,
+    # plus one byte per cell for the burning test (and a neighbour count once the fire is large).
+    flat_grid = grid.reshape(-1)
+    flat_timers = burn_timers.reshape(-1)
+    burning_idx = np.flatnonzero(grid == 2)
+
+    if rain_active and precipitation_strength > 0.6:
+        flat_grid[burning_idx] = 5  # Burnt
+    else:
+        flat_timers[burning_idx] -= 1
+        still_burning = flat_timers[burning_idx] > 0
+        flat_grid[burning_idx[~still_burning]] = 5  # Burnt
+        spreading_idx = burning_idx[still_burning]
+
+        # Every neighbour that is still burning tries once, so a cell with k of them
+        # escapes with probability (1 - p) ** k, exactly as in the per-cell loop
+        ignition_chance = ignition_probability(humidity, precipitation_strength, wind_strength, drying_effect)
+        chance_by_count = 1 - (1 - ignition_chance) ** np.arange(9)
+
+        # One batched draw per step, only for fuel cells that have a burning neighbour
+        if spreading_idx.size < SPARSE_SPREADING_FRACTION * grid.size:
+            neighbours = grid_neighbours(spreading_idx, *grid.shape)[0]
+            neighbour_states = flat_grid[neighbours]
+            candidates, counts = np.unique(neighbours[(neighbour_states == 1) | (neighbour_states == 6)],
+                                           return_counts=True)
+        else:
+            counts = count_burning_neighbours(spreading_idx, grid.shape).reshape(-1)
+            candidates = np.flatnonzero(counts != 0)
+            candidate_states = flat_grid[candidates]
+            candidates = candidates[(candidate_states == 1) | (candidate_states == 6)]
+            counts = counts[candidates]
+        draws = rng.random(candidates.size)
+        ignited = candidates[draws < chance_by_count[counts]]
+        flat_grid[ignited] = 2
+        flat_timers[ignited] = 8
+
+    np.subtract(moisture_map, drying_effect * wind_strength, out=moisture_map)
+    np.clip(moisture_map, 0, 1, out=moisture_map)
+    return grid, moisture_map, burn_timers
+
+# Bit s set for every fuel (tree) state s, so (FUEL_STATES >> state) & 1 tests a grid without
+# a lookup table, whose uint8 indices np.take would widen to a grid-sized intp copy
+FUEL_STATES = np.uint8(1 << 1 | 1 << 6)
+# Cells whose ignition candidates CompactSimulation draws for at once. Generator.random(n) returns
+# the same stream in blocks as in one call, so the block size bounds the memory of a dense fire's
+# index and draw arrays without changing any result.
+CANDIDATE_BLOCK = 1 << 16
+
+class CompactSimulation:
+    # uint8 cell states and timers, 2 bytes per cell instead of 24 for int64 forest, float64 moisture
+    # and int timers, stepped in place. A step reads the neighbourhood only through the mask of
+    # spreading cells it takes first, so it needs no second copy of the state: its scratch is
+    # one byte mask and one padded byte grid, reused every step. All told the engine holds 4 bytes
+    # per cell, 12x under the ~48 bytes per cell the per-cell loop peaks at (its three state arrays
+    # and their per-step copies), though only 6x under those 24 bytes of state alone. Beyond that a
+    # step allocates index and draw arrays for at most CANDIDATE_BLOCK cells at a time.
+    # moisture_map is optional; when given it is kept as float32 (4 more bytes per cell) and dried in place.
+    # With a draw_key, ignition draws come from cell_uniforms instead of rng, which makes this the
+    # in-memory reference for the tiled engine.
+    def __init__(self, forest, burn_timers, humidity, precipitation_strength, wind_strength, drying_effect, rng,
+                 moisture_map=None, draw_key=None):
+        rows, cols = forest.shape
+        self.forest = forest.astype(np.uint8)
+        self.burn_timers = burn_timers.astype(np.uint8)
+        self.moisture_map = None if moisture_map is None else moisture_map.astype(np.float32)
+
+        # Scratch reused every step: the mask is the burning cells, then those that burnt out, then
+        # (viewed as uint8) the neighbour counts; the padded grid holds the spreading cells
+        self.mask = np.empty((rows, cols), dtype=bool)
+        self.padded = np.zeros((rows + 2, cols + 2), dtype=np.uint8)
+
+        self.rng = rng
+        self.draw_key = draw_key
+        self.draw_step = 0
+        self.precipitation_strength = precipitation_strength
+        self.drying = drying_effect * wind_strength
+        ignition_chance = ignition_probability(humidity, precipitation_strength, wind_strength, drying_effect)
+        self.chance_by_count = 1 - (1 - ignition_chance) ** np.arange(9)
+        self.burning_count = int(np.count_nonzero(np.equal(self.forest, 2, out=self.mask)))
+        self.ignited_count = 0  # Cells the last step set alight
+        self.changed = None  # Not tracked; a recorder compares whole frames
+
+    def count_neighbours(self, counts):
+        # Same separable 3x3 box sum as count_burning_neighbours, of the spreading cells in the
+        # padded interior, into counts. The column sums are built inside the padded grid itself:
+        # counts first takes the left and right neighbours, the interior adds them to its centre
+        # cell, and counts then adds the interior rows above and below.
+        padded = self.padded
+        interior = padded[1:-1, 1:-1]
+        np.add(padded[1:-1, :-2], padded[1:-1, 2:], out=counts)
+        np.add(interior, counts, out=interior)
+        np.add(counts, padded[:-2, 1:-1], out=counts)
+        np.add(counts, padded[2:, 1:-1], out=counts)
+        return counts
+
+    def step(self, rain_active):
+        grid, burn_timers, mask = self.forest, self.burn_timers, self.mask
+        np.equal(grid, 2, out=mask)  # Burning
+
+        if rain_active and self.precipitation_strength > 0.6:
+            np.putmask(grid, mask, 5)  # Burnt
+            self.burning_count = 0
+            self.ignited_count = 0
+        else:
+            spreading = self.padded[1:-1, 1:-1]
+            np.subtract(burn_timers, 1, out=burn_timers, where=mask)
+            np.greater(burn_timers, 0, out=spreading)
+            np.logical_and(spreading, mask, out=spreading)
+            np.logical_xor(mask, spreading, out=mask)  # Now the cells that burnt out
+            np.putmask(grid, mask, 5)  # Burnt, which only changes burning cells, never fuel
+            spreading_count = int(np.count_nonzero(spreading))
+
+            # Fuel cells next to a spreading cell keep their count, all others drop to 0
+            counts = self.count_neighbours(mask.view(np.uint8))
+            fuel = self.padded[1:-1, 1:-1]  # Free again once counted
+            np.right_shift(FUEL_STATES, grid, out=fuel)
+            np.bitwise_and(fuel, 1, out=fuel)
+            np.multiply(counts, fuel, out=counts)
+            counts, flat_grid, flat_timers = counts.reshape(-1), grid.reshape(-1), burn_timers.reshape(-1)
+            self.ignited_count = 0
+            for start in range(0, counts.size, CANDIDATE_BLOCK):
+                candidates = np.flatnonzero(counts[start:start + CANDIDATE_BLOCK]) + start
+                if self.draw_key is None:
+                    draws = self.rng.random(candidates.size)
+                else:
+                    draws = cell_uniforms(self.draw_key, self.draw_step, candidates)
+                ignited = candidates[draws < self.chance_by_count[counts[candidates]]]
+                flat_grid[ignited] = 2
+                flat_timers[ignited] = 8
+                self.ignited_count += ignited.size
+            self.burning_count = spreading_count + self.ignited_count
+
+        if self.moisture_map is not None:
+            np.subtract(self.moisture_map, self.drying, out=self.moisture_map)
+            np.clip(self.moisture_map, 0, 1, out=self.moisture_map)
+
+        self.draw_step += 1
+        return self.burning_count
+
+    @property
+    def burned_cells(self):
+        return int(np.count_nonzero(self.forest == 5))
+
+    def state(self):
+        state = dict(forest=self.forest, burn_timers=self.burn_timers)
+        if self.moisture_map is not None:
+            state["moisture_map"] = self.moisture_map
+        return state
+
+    def restore(self, steps_taken, forest, burn_timers, moisture_map=None):
+        self.draw_step = steps_taken
+        np.copyto(self.forest, forest)
+        np.copyto(self.burn_timers, burn_timers)
+        if moisture_map is not None and self.moisture_map is not None:
+            np.copyto(self.moisture_map, moisture_map)
+        self.burning_count = int(np.count_nonzero(np.equal(self.forest, 2, out=self.mask)))
+
+def run_loop(simulation, rng, precipitation_chance, snapshot=None, recorder=None, telemetry=None):
+    # The loop of run_simulation_without_visuals, shared by the engines' run_to_completion: draw the
+    # rain, record, stop once nothing burns, step. simulation is an engine's simulation object.
+    # With a checkpoint.RunSnapshot the run resumes from its last snapshot (simulation.restore) and
+    # saves a new one (simulation.state) when due. A recorder.RunRecorder is given the cell states of
+    # every step, and a telemetry.RunTelemetry times the steps and counts the fire.
+    steps_taken = 0
+    restored = None if snapshot is None else snapshot.load(rng)
+    if restored is not None:
+        steps_taken, state = restored
+        simulation.restore(steps_taken, **state)
+    if telemetry is not None:
+        simulation = telemetry.instrument(simulation)
+    while True:
+        if snapshot is not None and snapshot.due():
+            snapshot.save(rng, steps_taken, **simulation.state())
+        rain_active = rng.random() < precipitation_chance
+        if recorder is not None:
+            recorder.record(steps_taken, simulation.forest, rain_active, simulation.changed)
+        steps_taken += 1
+
+        if simulation.burning_count == 0:  # No burning cells
+            break
+
+        simulation.step(rain_active)
+
+    if snapshot is not None:
+        snapshot.discard()
+    burned_cells = simulation.burned_cells
+    if telemetry is not None:
+        telemetry.finish(burned_cells, steps_taken)
+    return burned_cells, steps_taken
+
+def run_to_completion(forest, burn_timers, humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
+                      rng, moisture_map=None, snapshot=None, hashed_draws=False, recorder=None, telemetry=None):
+    # run_loop on the compact double-buffered state.
+    # hashed_draws takes a draw key from rng and uses cell_uniforms, as tiled.run_to_completion does.
+    draw_key = new_draw_key(rng) if hashed_draws else None
+    simulation = CompactSimulation(forest, burn_timers, humidity, precipitation_strength, wind_strength, drying_effect,
+                                   rng, moisture_map, draw_key)
+    return run_loop(simulation, rng, precipitation_chance, snapshot, recorder, telemetry)
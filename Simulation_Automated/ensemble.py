@@ -0,0 +1,100 @@
+import numpy as np
+from engine import count_burning_neighbours, ignition_probability
+
+def ignite_members(forest, burn_timers, rngs):
+    # Stack one copy of the landscape per member and light one random fuel cell in each,
+    # drawn uniformly like ignite_random_fire from that member's own generator
+    members = len(rngs)
+    stack = np.repeat(forest[np.newaxis].astype(np.uint8), members, axis=0)
+    timers = np.repeat(burn_timers[np.newaxis].astype(np.uint8), members, axis=0)
+    fuel_idx = np.flatnonzero((forest == 1) | (forest == 6))
+    picks = fuel_idx[[rng.integers(fuel_idx.size) for rng in rngs]]
+    stack.reshape(members, -1)[np.arange(members), picks] = 2
+    # ignite_random_fire checks the cell after setting it to 2, so the starting timer is always 3
+    timers.reshape(members, -1)[np.arange(members), picks] = 3
+    return stack, timers
+
+def ensemble_step(stack, timers, precipitation_strengths, chance_by_count, rain_active, rngs):
+    # Advance every member of the (K, rows, cols) stack by one step, in place.
+    # Only burning cells change to burnt and only fuel cells change to burning,
+    # so neighbour counts and fuel checks still see the state from the start of the step.
+    # Each member draws from its own generator, so its run does not depend on the other members.
+    members, rows, cols = stack.shape
+    flat_stack = stack.reshape(-1)
+    flat_timers = timers.reshape(-1)
+    burning_idx = np.flatnonzero(flat_stack == 2)
+
+    extinguished = (rain_active & (precipitation_strengths > 0.6))[burning_idx // (rows * cols)]
+    flat_stack[burning_idx[extinguished]] = 5  # Burnt
+    burning_idx = burning_idx[~extinguished]
+
+    flat_timers[burning_idx] -= 1
+    still_burning = flat_timers[burning_idx] > 0
+    flat_stack[burning_idx[~still_burning]] = 5  # Burnt
+    spreading_idx = burning_idx[still_burning]
+
+    counts = count_burning_neighbours(spreading_idx, stack.shape).reshape(-1)
+    candidates = np.flatnonzero(counts)
+    candidate_states = flat_stack[candidates]
+    candidates = candidates[(candidate_states == 1) | (candidate_states == 6)]
+    candidate_members = candidates // (rows * cols)
+    draws = np.empty(candidates.size)
+    # candidates are sorted, so each member's cells form one contiguous block
+    ends = np.cumsum(np.bincount(candidate_members, minlength=members))
+    for member in np.flatnonzero(np.diff(ends, prepend=0)):
+        start = ends[member - 1] if member else 0
+        draws[start:ends[member]] = rngs[member].random(ends[member] - start)
+    ignited = candidates[draws < chance_by_count[candidate_members, counts[candidates]]]
+    flat_stack[ignited] = 2
+    flat_timers[ignited] = 8
+
+    # Burning cells left in each member, so callers never rescan the stack to find finished runs
+    return (np.bincount(spreading_idx // (rows * cols), minlength=members)
+            + np.bincount(ignited // (rows * cols), minlength=members))
+
+def run_ensemble(forest, burn_timers, parameters, seeds):
+    # parameters holds one (humidity, precipitation_strength, precipitation_chance, wind_strength)
+    # row per member and seeds one SeedSequence per member; drying_effect equals wind_strength as in the sweep.
+    # moisture_map never feeds back into spreading, so the ensemble does not carry it.
+    parameters = np.asarray(parameters, dtype=float).reshape(-1, 4)
+    members = len(parameters)
+    total_trees = np.sum((forest == 1) | (forest == 6))
+
+    rngs = [np.random.default_rng(seed) for seed in seeds]
+    stack, timers = ignite_members(forest, burn_timers, rngs)
+    precipitation_strengths = parameters[:, 1]
+    precipitation_chances = parameters[:, 2]
+    chance_by_count = np.array([1 - (1 - ignition_probability(h, ps, ws, ws)) ** np.arange(9)
+                                for h, ps, _, ws in parameters])
+
+    member_ids = np.arange(members)
+    burning_counts = np.ones(members, dtype=int)
+    burned_cells = np.zeros(members, dtype=int)
+    steps_taken = np.zeros(members, dtype=int)
+    steps = 0
+
+    while member_ids.size:
+        rain_active = np.array([rng.random() for rng in rngs]) < precipitation_chances
+        steps += 1
+
+        finished = burning_counts == 0  # No burning cells
+        if finished.any():
+            burned_cells[member_ids[finished]] = np.sum(stack[finished] == 5, axis=(1, 2))
+            steps_taken[member_ids[finished]] = steps
+
+            # Compact the stack so finished members stop costing time
+            keep = ~finished
+            stack, timers = stack[keep], timers[keep]
+            precipitation_strengths = precipitation_strengths[keep]
+            precipitation_chances = precipitation_chances[keep]
+            chance_by_count = chance_by_count[keep]
+            rain_active = rain_active[keep]
+            rngs = [rng for rng, kept in zip(rngs, keep) if kept]
+            member_ids = member_ids[keep]
+            if not member_ids.size:
+                break
+
+        burning_counts = ensemble_step(stack, timers, precipitation_strengths, chance_by_count, rain_active, rngs)
+
+    burned_percentage = (burned_cells / total_trees) * 100
+    return burned_cells, burned_percentage, steps_taken
@@ -0,0 +1,134 @@
+import numpy as np
+from engine import grid_neighbours, ignition_probability, run_loop
+
+# Event-driven engine. The tick engines visit every burning cell on every step to decrement its
+# timer, but a cell's whole future is known the moment it ignites: lit at tick t with timer T, it
+# tries each neighbour once per tick from t + 1 to t + T - 1 and burns out at t + T. So on ignition
+# this engine schedules the burnout, and for every fuel neighbour the tick of its first successful
+# attempt, drawn as a geometric variable and dropped when it falls after t + T - 1. Attempts from
+# different neighbours are independent, so a cell ignites at the earliest of its scheduled ticks,
+# exactly as it would under per-tick draws: the results are statistically equivalent to the tick
+# engines (not draw-for-draw identical), and work scales with ignitions rather than burning-cell ticks.
+
+# Ticks covered by the calendar; uint8 timers put every event within 255 ticks of the current one
+CALENDAR_TICKS = 256
+IGNITED_TIMER = 8
+
+class EventSimulation:
+    # Bucketed calendar queue: slot tick % CALENDAR_TICKS holds the arrays of cells that burn out
+    # and the cells that are reached by a first successful attempt at that tick. A step only
+    # touches its own slot. Cells are never un-scheduled: an attempt on a cell that has already
+    # ignited is dropped when its slot comes up, since the cell is no longer fuel.
+    def __init__(self, forest, burn_timers, humidity, precipitation_strength, wind_strength, drying_effect, rng):
+        self.forest = forest
+        self.flat_forest = forest.reshape(-1)
+        self.rows, self.cols = forest.shape
+        self.rng = rng
+        self.precipitation_strength = precipitation_strength
+        self.ignition_chance = ignition_probability(humidity, precipitation_strength, wind_strength, drying_effect)
+        self.tick = 0
+        self.burnouts = [[] for _ in range(CALENDAR_TICKS)]
+        self.attempts = [[] for _ in range(CALENDAR_TICKS)]
+        self.burning_count = 0
+        self.burned_cells = int(np.sum(forest == 5))
+        self.ignited_count = 0  # Cells the last step set alight
+        self.changed = np.empty(0, dtype=np.intp)  # Cells the last step changed, for recorder.RunRecorder
+
+        # Fires already burning are scheduled as if lit at tick 0 with their current timers
+        burning = np.flatnonzero(forest == 2)
+        self.schedule(burning, np.maximum(burn_timers.reshape(-1)[burning], 1).astype(np.intp))
+
+    def schedule(self, cells, timers):
+        # Put the burnout and the first successful attempt on every fuel neighbour of cells,
+        # which are now burning with timers (one per cell, or one for all), on the calendar
+        self.burning_count += cells.size
+        if np.ndim(timers):
+            for timer in np.unique(timers):
+                self.burnouts[(self.tick + timer) % CALENDAR_TICKS].append(cells[timers == timer])
+        else:
+            self.burnouts[(self.tick + timers) % CALENDAR_TICKS].append(cells)
+
+        if self.ignition_chance <= 0 or not cells.size:
+            return
+        neighbours, sources = grid_neighbours(cells, self.rows, self.cols)
+        states = self.flat_forest[neighbours]
+        fuel = (states == 1) | (states == 6)  # Anything else never becomes fuel again
+        neighbours = neighbours[fuel]
+        delays = self.rng.geometric(self.ignition_chance, neighbours.size)
+        # Attempts run for timer - 1 ticks
+        reached = delays < (timers[sources[fuel]] if np.ndim(timers) else timers)
+        neighbours, delays = neighbours[reached], delays[reached]
+        # One slot append per delay, from a single grouping pass
+        order = np.argsort(delays, kind="stable")
+        counts = np.bincount(delays)
+        bounds = np.cumsum(counts)
+        for delay in np.flatnonzero(counts):
+            self.attempts[(self.tick + delay) % CALENDAR_TICKS].append(
+                neighbours[order[bounds[delay] - counts[delay]:bounds[delay]]])
+
+    def take(self, slot):
+        # Every cell listed in a calendar slot, emptying it
+        cells = np.concatenate(slot) if slot else np.empty(0, dtype=np.intp)
+        slot.clear()
+        return cells
+
+    def step(self, rain_active):
+        self.tick += 1
+        slot = self.tick % CALENDAR_TICKS
+        if rain_active and self.precipitation_strength > 0.6:
+            # Everything burning goes out now, and nothing it scheduled happens
+            burnt_out = np.concatenate([self.take(slot) for slot in self.burnouts])
+            for slot in self.attempts:
+                slot.clear()
+            self.flat_forest[burnt_out] = 5  # Burnt
+            self.burned_cells += burnt_out.size
+            self.burning_count = 0
+            self.ignited_count = 0
+            self.changed = burnt_out
+            return
+
+        burnt_out = self.take(self.burnouts[slot])
+        self.flat_forest[burnt_out] = 5  # Burnt
+        self.burned_cells += burnt_out.size
+        self.burning_count -= burnt_out.size
+
+        # Fuel is checked after this tick's burnouts, which only turn burning cells to burnt
+        reached = self.take(self.attempts[slot])
+        states = self.flat_forest[reached]
+        ignited = np.unique(reached[(states == 1) | (states == 6)])
+        self.flat_forest[ignited] = 2
+        self.schedule(ignited, IGNITED_TIMER)
+        self.ignited_count = ignited.size
+        self.changed = np.concatenate([burnt_out, ignited])
+
+    def state(self):
+        # The calendar flattened into (tick, kind, cell) columns, kind 0 a burnout and 1 an attempt
+        ticks, kinds, cells = [], [], []
+        for kind, calendar in enumerate((self.burnouts, self.attempts)):
+            for offset in range(1, CALENDAR_TICKS + 1):
+                tick = self.tick + offset
+                for slot_cells in calendar[tick % CALENDAR_TICKS]:
+                    ticks.append(np.full(slot_cells.size, tick))
+                    kinds.append(np.full(slot_cells.size, kind))
+                    cells.append(slot_cells)
+        return dict(forest=self.forest, tick=np.array(self.tick), event_ticks=np.concatenate(ticks or [[]]),
+                    event_kinds=np.concatenate(kinds or [[]]), event_cells=np.concatenate(cells or [[]]))
+
+    def restore(self, steps_taken, forest, tick, event_ticks, event_kinds, event_cells):
+        self.flat_forest[:] = forest.reshape(-1)
+        self.tick = int(tick)
+        self.burnouts = [[] for _ in range(CALENDAR_TICKS)]
+        self.attempts = [[] for _ in range(CALENDAR_TICKS)]
+        event_cells = event_cells.astype(np.intp)
+        for kind, calendar in enumerate((self.burnouts, self.attempts)):
+            for event_tick in np.unique(event_ticks[event_kinds == kind]):
+                calendar[int(event_tick) % CALENDAR_TICKS].append(
+                    event_cells[(event_kinds == kind) & (event_ticks == event_tick)])
+        self.burning_count = int(np.count_nonzero(event_kinds == 0))
+        self.burned_cells = int(np.sum(self.forest == 5))
+
+def run_to_completion(forest, burn_timers, humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
+                      rng, snapshot=None, recorder=None, telemetry=None):
+    # engine.run_loop on the event calendar; a step that has no events costs a few list lookups
+    simulation = EventSimulation(forest, burn_timers, humidity, precipitation_strength, wind_strength, drying_effect, rng)
+    return run_loop(simulation, rng, precipitation_chance, snapshot, recorder, telemetry)
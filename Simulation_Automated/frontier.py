@@ -0,0 +1,83 @@
+import numpy as np
+from engine import grid_neighbours, ignition_probability, run_loop
+
+class FrontierSimulation:
+    # Keeps the burning cells as a flat index array with their timers alongside, so a step
+    # only touches burning cells and the fuel next to them instead of the whole grid.
+    # forest is updated in place; moisture_map is not carried since it never feeds back into spreading.
+    def __init__(self, forest, burn_timers, humidity, precipitation_strength, wind_strength, drying_effect, rng):
+        self.forest = forest
+        self.rng = rng
+        self.rows, self.cols = forest.shape
+        self.flat_forest = forest.reshape(-1)
+        self.precipitation_strength = precipitation_strength
+        ignition_chance = ignition_probability(humidity, precipitation_strength, wind_strength, drying_effect)
+        self.chance_by_count = 1 - (1 - ignition_chance) ** np.arange(9)
+
+        # The only full-grid scans: finding the initial fire and counting what is already burnt
+        self.burning = np.flatnonzero(forest == 2)
+        self.timers = burn_timers.reshape(-1)[self.burning].astype(np.uint8)
+        self.burned_cells = int(np.sum(forest == 5))
+        self.changed = self.burning[:0]  # Cells the last step changed, for recorder.RunRecorder
+        self.ignited_count = 0  # Cells the last step set alight
+
+    @property
+    def burning_count(self):
+        return self.burning.size
+
+    def burn_out(self, cells):
+        self.flat_forest[cells] = 5  # Burnt
+        self.burned_cells += cells.size
+
+    def neighbours(self, cells):
+        # Flat indices of every in-grid neighbour of cells, repeated once per burning neighbour
+        return grid_neighbours(cells, self.rows, self.cols)[0]
+
+    def step(self, rain_active):
+        if rain_active and self.precipitation_strength > 0.6:
+            self.burn_out(self.burning)
+            self.changed = self.burning
+            self.ignited_count = 0
+            self.burning = self.burning[:0]
+            self.timers = self.timers[:0]
+            return
+
+        self.timers -= 1
+        still_burning = self.timers > 0
+        burnt_out = self.burning[~still_burning]
+        self.burn_out(burnt_out)
+        spreading = self.burning[still_burning]
+        self.timers = self.timers[still_burning]
+
+        # A fuel cell with k spreading neighbours escapes with (1 - p) ** k, as in spread_fire
+        candidates = self.neighbours(spreading)
+        candidate_states = self.flat_forest[candidates]
+        candidates = candidates[(candidate_states == 1) | (candidate_states == 6)]
+        cells, counts = np.unique(candidates, return_counts=True)
+        ignited = cells[self.rng.random(cells.size) < self.chance_by_count[counts]]
+
+        self.flat_forest[ignited] = 2
+        self.changed = np.concatenate([burnt_out, ignited])
+        self.ignited_count = ignited.size
+        self.burning = np.concatenate([spreading, ignited])
+        self.timers = np.concatenate([self.timers, np.full(ignited.size, 8, dtype=np.uint8)])
+
+    def state(self):
+        return dict(forest=self.forest, burning=self.burning, timers=self.timers)
+
+    def restore(self, steps_taken, forest, burning, timers):
+        self.flat_forest[:] = forest.reshape(-1)
+        self.burning = burning
+        self.timers = timers
+        self.burned_cells = int(np.sum(self.forest == 5))
+
+    def write_burn_timers(self, burn_timers):
+        # Copy the live timers back into a dense burn_timers grid
+        burn_timers.reshape(-1)[self.burning] = self.timers
+        return burn_timers
+
+def run_to_completion(forest, burn_timers, humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
+                      rng, snapshot=None, recorder=None, telemetry=None):
+    # engine.run_loop on the burning frontier; snapshots, recordings and telemetry work as there
+    simulation = FrontierSimulation(forest, burn_timers, humidity, precipitation_strength, wind_strength, drying_effect, rng)
+    return run_loop(simulation, rng, precipitation_chance, snapshot, recorder, telemetry)
@@ -0,0 +1,528 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import product
+from checkpoint import landscape_fingerprint
+from landscape import cached_landscape, count_trees, generate_landscape
+from result_store import METRIC_COLUMNS, ResultStore
+from seeds import landscape_rng, new_master_seed, simulation_seed
+from sweep import run_engines, simulate_chunk
+
+# Local sweep service: one process owns a pool of warm worker processes and runs the sweeps that
+# clients submit over a TCP socket, so several users of one machine share the pool instead of
+# each starting their own. Jobs are split into work units (chunks of runs) that are handed to the
+# pool round-robin across jobs, so a small job is not stuck behind a large one.
+#
+# The protocol is JSON, one object per line. Clients send {"op": ...} requests, with an optional
+# "id" that is echoed in the reply:
+#
+#   {"op": "submit", "spec": {...}, "watch": true}  ->  {"reply": "submitted", "job": 1, ...}
+#   {"op": "watch", "job": 1, "results": true}      ->  {"reply": "watching", ..., "results": [...]} and then events
+#   {"op": "jobs"}                                  ->  {"reply": "jobs", "jobs": [status, ...]}
+#   {"op": "cancel", "job": 1}                      ->  {"reply": "cancelled", ...}
+#
+# Watchers receive {"event": "progress", ...status} after every unit, {"event": "results",
+# "columns": [...], "results": [...]} with the unit's runs when they asked for results, and one
+# {"event": "finished" | "failed" | "cancelled", ...status} at the end. A failed request gets
+# {"reply": "error", "message": ...}.
+#
+# Ended jobs are kept for JOB_RETENTION seconds, and only the last RETAINED_JOBS of them. Their
+# rows are dropped once the job ends if a watcher received them or the job has a store; watching
+# such a job with results reads its rows back from the store.
+#
+#   python job_server.py serve --workers 32
+#   python job_server.py submit --rows 200 --cols 200 --values 0,0.5,1 --replicas 5 --store runs.db
+
+DEFAULT_PORT = 8765
+DEFAULT_VALUES = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]
+PARAMETERS = ["humidity", "precipitation_strength", "precipitation_chance", "wind_strength"]
+RESULT_FIELDS = ["combination", "replica"] + PARAMETERS + ["burned_cells", "burned_percentage", "steps_taken"]
+# Engines a job may ask for; tiled runs need per-job scratch directories and are left to cli.py
+JOB_ENGINES = ["ensemble"] + list(run_engines)
+JOB_RETENTION = 3600.0
+RETAINED_JOBS = 100
+# Tries of a unit whose worker died; a unit that keeps killing its worker fails its job
+UNIT_ATTEMPTS = 2
+
+# Landscapes of recent jobs kept by each worker, so the units of a job do not regenerate them
+worker_landscapes = OrderedDict()
+WORKER_LANDSCAPES = 4
+
+def job_landscape(rows, cols, master_seed, cache_directory=None):
+    # Worker side: the landscape of a job, generated from its master seed as cli.py does
+    key = (rows, cols, master_seed, cache_directory)
+    landscape = worker_landscapes.pop(key, None)
+    if landscape is None:
+        if cache_directory:
+            landscape = cached_landscape(rows, cols, master_seed, cache_directory)
+        else:
+            landscape = generate_landscape(rows, cols, landscape_rng(master_seed))
+    worker_landscapes[key] = landscape
+    while len(worker_landscapes) > WORKER_LANDSCAPES:
+        worker_landscapes.popitem(last=False)
+    return landscape
+
+def describe_landscape(landscape_spec):
+    forest, moisture_map, burn_timers = job_landscape(*landscape_spec)
+    return landscape_fingerprint(forest, moisture_map, burn_timers), count_trees(forest)
+
+def run_unit(landscape_spec, chunk, engine):
+    forest, _, burn_timers = job_landscape(*landscape_spec)
+    return simulate_chunk(forest, burn_timers, chunk, engine)
+
+def stored_rows(settings, landscape):
+    # Result rows of a job read back from its store: the runs of its grid on its landscape, also
+    # those an earlier job with the same seed had already stored
+    combinations, replicas = settings["combinations"], settings["replicas"]
+    rows = []
+    with ResultStore(settings["store"]) as store:
+        for index, spawn_key, *values in store.runs(["combination", "spawn_key"] + PARAMETERS + METRIC_COLUMNS,
+                                                    landscape=landscape, master_seed=str(settings["master_seed"]),
+                                                    engine=settings["engine"]):
+            replica = int(spawn_key.rsplit(",", 1)[1])
+            if index < len(combinations) and replica < replicas and tuple(values[:4]) == combinations[index]:
+                rows.append([index, replica, *values])
+    return rows
+
+def open_run_writer(settings, fingerprint, trees, sweep):
+    # Writer thread side, as are the two below: open a job's store, record its landscape and
+    # return the RunWriter of its runs. SQLite connections stay on the thread that opened them.
+    store = ResultStore(settings["store"])
+    store.record_landscape(fingerprint, settings["rows"], settings["cols"], trees)
+    return store.writer(fingerprint, settings["master_seed"], settings["engine"], sweep=sweep)
+
+def write_results(runs, settings, results):
+    replicas, master_seed = settings["replicas"], settings["master_seed"]
+    for run, combination, cells, percentage, steps in results:
+        index = run // replicas
+        runs.write(index, combination, cells, percentage, steps, simulation_seed(master_seed, index, run % replicas))
+    runs.flush()
+
+def close_run_writer(runs):
+    runs.close()
+    runs.store.close()
+
+def warm_worker(seconds):
+    # Held briefly, so the pool starts a new process for each warm-up call instead of reusing an idle one
+    time.sleep(seconds)
+    return os.getpid()
+
+def parse_spec(spec):
+    # Checked job settings from a submitted spec; raises ValueError on anything unusable
+    if not isinstance(spec, dict):
+        raise ValueError("spec must be an object.")
+    unknown = set(spec) - {"rows", "cols", "seed", "values", "replicas", "engine", "landscape_cache", "store",
+                           "chunk_size", "name"} - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown spec fields: {', '.join(sorted(unknown))}.")
+    rows, cols = int(spec.get("rows", 100)), int(spec.get("cols", 100))
+    replicas, chunk_size = int(spec.get("replicas", 1)), int(spec.get("chunk_size", 64))
+    if min(rows, cols, replicas, chunk_size) < 1:
+        raise ValueError("rows, cols, replicas and chunk_size must be positive.")
+    engine = spec.get("engine", "ensemble")
+    if engine not in JOB_ENGINES:
+        raise ValueError(f"Unknown engine {engine}; expected one of {', '.join(JOB_ENGINES)}.")
+    values = [float(value) for value in spec.get("values", DEFAULT_VALUES)]
+    grid = [[float(value) for value in spec.get(name) or values] for name in PARAMETERS]
+    master_seed = new_master_seed() if spec.get("seed") is None else int(spec["seed"])
+    return dict(rows=rows, cols=cols, master_seed=master_seed, combinations=list(product(*grid)),
+                replicas=replicas, engine=engine, landscape_cache=spec.get("landscape_cache"),
+                store=spec.get("store"), chunk_size=chunk_size, name=str(spec.get("name", "")))
+
+class Job:
+    def __init__(self, number, settings):
+        self.number = number
+        self.settings = settings
+        self.landscape_spec = (settings["rows"], settings["cols"], settings["master_seed"], settings["landscape_cache"])
+        # Run (index, replica) of the grid uses simulation_seed(master_seed, index, replica), so
+        # replica 0 of every combination reproduces cli.py --no-dedupe
+        combinations, replicas = settings["combinations"], settings["replicas"]
+        runs = [(index * replicas + replica, combinations[index], simulation_seed(settings["master_seed"], index, replica))
+                for index in range(len(combinations)) for replica in range(replicas)]
+        self.units = deque(runs[start:start + settings["chunk_size"]]
+                           for start in range(0, len(runs), settings["chunk_size"]))
+        self.total = len(runs)
+        self.completed = 0
+        self.in_flight = 0
+        self.rows = []  # None once dropped
+        self.state = "preparing"
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+        self.watchers = {}  # Connection -> whether it wants result rows
+        self.runs = None  # result_store.RunWriter when the spec names a store
+        self.writer = None  # Thread that does all of the store's I/O, in order
+        self.landscape = None  # Fingerprint
+
+    def status(self):
+        elapsed = 0.0 if self.started is None else (self.ended or time.perf_counter()) - self.started
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.completed) / rate if rate > 0 and self.state == "running" else None
+        settings = self.settings
+        return dict(job=self.number, name=settings["name"], state=self.state, completed=self.completed,
+                    total=self.total, rate=rate, eta=eta, elapsed=elapsed, engine=settings["engine"],
+                    rows=settings["rows"], cols=settings["cols"], master_seed=settings["master_seed"],
+                    combinations=len(settings["combinations"]), replicas=settings["replicas"],
+                    submitted=self.submitted, error=self.error)
+
+    def result_rows(self, results):
+        replicas = self.settings["replicas"]
+        return [[run // replicas, run % replicas, *combination, cells, percentage, steps]
+                for run, combination, cells, percentage, steps in results]
+
+    def notify(self, message, rows=None):
+        for connection, wants_results in list(self.watchers.items()):
+            if rows and wants_results:
+                connection.send(dict(event="results", job=self.number, columns=RESULT_FIELDS, results=rows))
+            connection.send(message)
+
+class Connection:
+    # One client; replies and events go through a queue drained by its own task, so a slow
+    # client never holds up the dispatcher
+    def __init__(self, writer):
+        self.writer = writer
+        self.outbox = asyncio.Queue()
+        self.sender = asyncio.create_task(self.send_all())
+
+    def send(self, message):
+        self.outbox.put_nowait(message)
+
+    async def send_all(self):
+        while True:
+            message = await self.outbox.get()
+            self.writer.write((json.dumps(message) + "\n").encode())
+            try:
+                await self.writer.drain()
+            except ConnectionError:
+                return
+
+    async def close(self):
+        self.sender.cancel()
+        self.writer.close()
+
+class JobServer:
+    def __init__(self, workers=None, units_in_flight=None):
+        self.workers = workers or os.cpu_count()
+        # Two units per worker keep every worker busy while the loop collects the last result
+        self.units_in_flight = units_in_flight or 2 * self.workers
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.jobs = {}
+        self.ended = deque()  # Numbers of ended jobs still kept, oldest first
+        self.ready = deque()  # Numbers of running jobs with units left, in round-robin order
+        self.in_flight = 0
+        self.wakeup = asyncio.Event()
+        self.next_job = 1
+        self.tasks = set()  # The loop only keeps weak references to tasks
+
+    def spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run_in_pool(self, function, *args):
+        # Run function in the pool; a worker dying (killed, out of memory) breaks the whole pool,
+        # so it is replaced and the call tried again on the new one
+        for attempt in range(UNIT_ATTEMPTS):
+            pool = self.pool
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, function, *args)
+            except BrokenProcessPool:
+                if pool is self.pool:  # Not already replaced by another call that failed with it
+                    print("A worker process died; starting a new pool")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                if attempt == UNIT_ATTEMPTS - 1:
+                    raise
+
+    async def warm(self):
+        # Start every worker process up front, so the first job does not pay for it
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self.pool, warm_worker, 0.2) for _ in range(self.workers)))
+        print(f"{len(set(pids))} worker process(es) ready")
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        await self.warm()
+        dispatcher = asyncio.create_task(self.dispatch())
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"Job server listening on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            dispatcher.cancel()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_client(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while line := await reader.readline():
+                request = None
+                try:
+                    request = json.loads(line)
+                    reply = await self.handle(connection, request)
+                except (ValueError, KeyError, TypeError) as error:
+                    reply = dict(reply="error", message=str(error))
+                    if isinstance(request, dict) and "id" in request:
+                        reply["id"] = request["id"]
+                connection.send(reply)
+        except ConnectionError:
+            pass
+        finally:
+            for job in self.jobs.values():
+                job.watchers.pop(connection, None)
+            await connection.close()
+
+    async def handle(self, connection, request):
+        op = request["op"]
+        if op == "submit":
+            job = self.submit(request["spec"])
+            if request.get("watch", True):
+                job.watchers[connection] = bool(request.get("results", False))
+            reply = dict(reply="submitted", **job.status())
+        elif op == "watch":
+            job = self.job(request)
+            wants_results = bool(request.get("results", False))
+            reply = dict(reply="watching", **job.status())
+            if wants_results and job.rows is None:
+                if not job.settings["store"]:
+                    raise ValueError(f"The rows of job {job.number} were delivered and dropped; "
+                                     f"give a job a store to read its rows again.")
+                # Ended, so nothing is written meanwhile
+                reply.update(columns=RESULT_FIELDS, results=await asyncio.to_thread(stored_rows, job.settings, job.landscape))
+            elif wants_results and job.rows:
+                reply.update(columns=RESULT_FIELDS, results=job.rows)  # Everything so far; later rows come as events
+            if job.state in ("preparing", "running"):
+                job.watchers[connection] = wants_results
+        elif op == "jobs":
+            reply = dict(reply="jobs", jobs=[job.status() for job in self.jobs.values()])
+        elif op == "cancel":
+            job = self.job(request)
+            self.finish(job, "cancelled")
+            reply = dict(reply="cancelled", **job.status())
+        else:
+            raise ValueError(f"Unknown op {op}.")
+        if "id" in request:
+            reply["id"] = request["id"]
+        return reply
+
+    def job(self, request):
+        number = int(request["job"])
+        if number not in self.jobs:
+            raise ValueError(f"No job {number}.")
+        return self.jobs[number]
+
+    def submit(self, spec):
+        job = Job(self.next_job, parse_spec(spec))
+        self.next_job += 1
+        self.jobs[job.number] = job
+        self.spawn(self.prepare(job))
+        return job
+
+    async def prepare(self, job):
+        # Generate the landscape on a worker, which keeps it for the job's units, and check it has trees
+        try:
+            fingerprint, trees = await self.run_in_pool(describe_landscape, job.landscape_spec)
+            if job.state != "preparing":  # Cancelled meanwhile
+                return
+            job.landscape = fingerprint
+            if trees == 0:
+                raise ValueError("No trees in the landscape to simulate burning.")
+            if job.settings["store"]:
+                job.writer = ThreadPoolExecutor(max_workers=1)
+                job.runs = await self.store(job, open_run_writer, job.settings, fingerprint, trees,
+                                            job.settings["name"] or f"job {job.number}")
+                if job.state != "preparing":  # Cancelled meanwhile
+                    self.close_store(job)
+                    return
+        except Exception as error:
+            job.error = f"{type(error).__name__}: {error}"
+            self.finish(job, "failed")
+            return
+        job.state = "running"
+        job.started = time.perf_counter()
+        self.ready.append(job.number)
+        self.wakeup.set()
+
+    async def dispatch(self):
+        # Hand units to the pool, one job at a time in turn, keeping units_in_flight of them queued
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.ready and self.in_flight < self.units_in_flight:
+                job = self.jobs.get(self.ready.popleft())
+                if job is None or job.state != "running" or not job.units:
+                    continue
+                unit = job.units.popleft()
+                if job.units:
+                    self.ready.append(job.number)
+                job.in_flight += 1
+                self.in_flight += 1
+                self.spawn(self.collect(job, unit))
+
+    async def collect(self, job, unit):
+        try:
+            results = await self.run_in_pool(run_unit, job.landscape_spec, unit, job.settings["engine"])
+        except Exception as error:
+            results = None
+            job.error = f"{type(error).__name__}: {error}"
+        finally:
+            job.in_flight -= 1
+            self.in_flight -= 1
+            self.wakeup.set()
+        if job.state != "running":
+            return
+        if results is None:
+            self.finish(job, "failed")
+            return
+        rows = job.result_rows(results)
+        job.rows.extend(rows)
+        job.completed += len(rows)
+        if job.runs is not None:
+            self.store(job, write_results, job.runs, job.settings, results)
+        job.notify(dict(event="progress", **job.status()), rows)
+        if job.completed == job.total:
+            self.finish(job, "finished")
+
+    def finish(self, job, state):
+        if job.state in ("finished", "failed", "cancelled"):
+            return
+        job.state = state
+        job.ended = time.perf_counter()
+        job.units.clear()
+        if job.runs is None:
+            self.announce(job)
+        else:
+            # Watchers hear the job ended once its last runs are in the store
+            self.close_store(job).add_done_callback(lambda _: self.announce(job))
+
+    def store(self, job, function, *args):
+        # Run function on the job's writer thread. A store locked by another process then holds up
+        # only this job's writes, never the loop; a failed write fails the job.
+        future = asyncio.get_running_loop().run_in_executor(job.writer, function, *args)
+        future.add_done_callback(lambda done: self.stored(job, done))
+        return future
+
+    def stored(self, job, future):
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        job.error = f"{type(error).__name__}: {error}"
+        if job.state == "finished":  # The write that failed was queued before the job ended
+            job.state = "failed"
+        self.finish(job, "failed")
+
+    def close_store(self, job):
+        closed = self.store(job, close_run_writer, job.runs)
+        job.runs = None
+        job.writer.shutdown(wait=False)  # After the writes already queued
+        return closed
+
+    def announce(self, job):
+        # Tell the watchers how the job ended, then keep it for JOB_RETENTION seconds
+        job.notify(dict(event=job.state, **job.status()))
+        if job.settings["store"] or any(job.watchers.values()):
+            job.rows = None  # Readable from the store, or delivered
+        job.watchers.clear()
+        self.ended.append(job.number)
+        asyncio.get_running_loop().call_later(JOB_RETENTION, self.evict, job.number)
+        while len(self.ended) > RETAINED_JOBS:
+            self.evict(self.ended[0])
+
+    def evict(self, number):
+        if number in self.ended:
+            self.ended.remove(number)
+            del self.jobs[number]
+
+async def request_lines(host, port, requests, until=None):
+    # Client side: send requests and yield every message received, until one satisfies until
+    reader, writer = await asyncio.open_connection(host, port)
+    for request in requests:
+        writer.write((json.dumps(request) + "\n").encode())
+    await writer.drain()
+    try:
+        while line := await reader.readline():
+            message = json.loads(line)
+            yield message
+            if until is None or until(message):
+                return
+    finally:
+        writer.close()
+
+async def run_client(args):
+    if args.command == "jobs":
+        requests = [dict(op="jobs")]
+    elif args.command == "cancel":
+        requests = [dict(op="cancel", job=args.job)]
+    elif args.command == "watch":
+        requests = [dict(op="watch", job=args.job)]
+    else:
+        spec = dict(rows=args.rows, cols=args.cols, seed=args.seed, values=args.values, replicas=args.replicas,
+                    engine=args.engine, landscape_cache=args.landscape_cache, store=args.store, name=args.name)
+        requests = [dict(op="submit", spec=spec, watch=not args.detach)]
+    watching = args.command == "watch" or (args.command == "submit" and not args.detach)
+
+    def done(message):
+        if message.get("reply") == "error":
+            return True
+        if not watching:
+            return "reply" in message
+        return message.get("event") in ("finished", "failed", "cancelled") or (
+            message.get("reply") == "watching" and message["state"] not in ("preparing", "running"))
+
+    async for message in request_lines(args.host, args.port, requests, done):
+        if message.get("reply") == "jobs":
+            for status in message["jobs"]:
+                print(f"Job {status['job']} {status['name']}: {status['state']} {status['completed']}/{status['total']}")
+        elif message.get("reply") == "error":
+            raise SystemExit(message["message"])
+        elif "reply" in message:
+            print(f"Job {message['job']} {message['reply']} ({message['total']} runs, master seed {message['master_seed']})")
+        else:
+            eta = message["eta"]
+            remaining = "unknown" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+            print(f"Job {message['job']}: {message['event']} {message['completed']}/{message['total']} | "
+                  f"{message['rate']:.2f}/s | ETA {remaining}" + (f" | {message['error']}" if message["error"] else ""))
+
+def parse_values(text):
+    return [float(value) for value in text.split(",") if value.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve forest fire sweeps to local clients, or talk to the server.")
+    parser.add_argument("--host", default="127.0.0.1", help="Server address (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Server port (default {DEFAULT_PORT})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Run the server")
+    serve.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: all cores)")
+    submit = commands.add_parser("submit", help="Submit a sweep and follow its progress")
+    submit.add_argument("--rows", type=int, default=100, help="Grid rows (default 100)")
+    submit.add_argument("--cols", type=int, default=100, help="Grid columns (default 100)")
+    submit.add_argument("--seed", type=int, help="Master seed (default: fresh entropy, reported back)")
+    submit.add_argument("--values", type=parse_values, default=DEFAULT_VALUES,
+                        help="Comma-separated values used for every parameter (default 0,0.1,...,1)")
+    submit.add_argument("--replicas", type=int, default=1, help="Runs per combination (default 1)")
+    submit.add_argument("--engine", choices=JOB_ENGINES, default="ensemble", help="Engine (default ensemble)")
+    submit.add_argument("--landscape-cache", help="Directory of generated landscapes on the server")
+    submit.add_argument("--store", help="Result store (SQLite) the server appends every run to")
+    submit.add_argument("--name", default="", help="Job name, also its sweep label in the store")
+    submit.add_argument("--detach", action="store_true", help="Return once the job is queued")
+    for name in ("watch", "cancel"):
+        command = commands.add_parser(name, help=f"{name.capitalize()} a job")
+        command.add_argument("job", type=int)
+    commands.add_parser("jobs", help="List the server's jobs")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "serve":
+            asyncio.run(JobServer(args.workers).serve(args.host, args.port))
+        else:
+            asyncio.run(run_client(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from scipy.ndimage import gaussian_filter
+from seeds import landscape_rng
+
+# Landscape generation shared by the GUI and the headless sweep; nothing here imports tkinter or matplotlib.
+# Every function draws from the explicit NumPy Generator it is given (see seeds.py).
+
+# Settings of the Generate Landscape button
+ROCK_CLUSTERS = dict(num_clusters=50, max_cluster_size=5)
+WATER_CLUSTERS = dict(probability=0.15, sigma=3, threshold=0.2)
+
+# Bump when a generator change alters the landscape drawn for a seed, so older cache entries are not reused
+GENERATOR_VERSION = 1
+LANDSCAPE_ARRAYS = ("forest", "moisture_map", "burn_timers")
+
+# Grid-sized draws and filters run over row bands of about this many cells, bounding the float64
+# temporaries on large grids. A Generator consumes its stream the same way for consecutive band
+# draws as for one draw of the whole grid, so banding does not change the landscape.
+BAND_CELLS = 1 << 22
+
+def row_bands(rows, cols):
+    band_rows = max(1, BAND_CELLS // max(cols, 1))
+    for start in range(0, rows, band_rows):
+        yield start, min(start + band_rows, rows)
+
+def initialize_forest(rows, cols, rng, out=None):
+    # Compact layout: uint8 cell states and timers, float32 moisture. out may supply the three
+    # arrays (memory maps, say), which are filled band by band so the grid need not fit in memory.
+    if out is None:
+        out = (np.empty((rows, cols), dtype=np.uint8), np.empty((rows, cols), dtype=np.float32),
+               np.empty((rows, cols), dtype=np.uint8))
+    forest, moisture_map, burn_timers = out
+    for start, stop in row_bands(rows, cols):
+        forest[start:stop] = rng.choice(np.array([1, 6], dtype=np.uint8), size=(stop - start, cols), p=[0.6, 0.4])
+    for start, stop in row_bands(rows, cols):
+        rng.random(dtype=np.float32, out=moisture_map[start:stop])
+    for start, stop in row_bands(rows, cols):
+        burn_timers[start:stop] = 0
+    return forest, moisture_map, burn_timers
+
+def add_rock_clusters(forest, num_clusters, max_cluster_size, rng):
+    # Square clusters clipped at the grid edge. The (row, col, size) of every cluster comes from one
+    # draw with per-element bounds, in the same stream order as drawing them cluster by cluster,
+    # and every covered cell is painted by a single fancy-index write.
+    rows, cols = forest.shape
+    draws = rng.integers(np.tile([0, 0, 1], num_clusters), np.tile([rows, cols, max_cluster_size + 1], num_clusters))
+    cluster_rows, cluster_cols, cluster_sizes = draws.reshape(-1, 3).T
+    cell_counts = cluster_sizes ** 2
+    cluster = np.repeat(np.arange(num_clusters), cell_counts)
+    offsets = np.arange(cell_counts.sum()) - np.repeat(np.cumsum(cell_counts) - cell_counts, cell_counts)
+    painted_rows = cluster_rows[cluster] + offsets // cluster_sizes[cluster]
+    painted_cols = cluster_cols[cluster] + offsets % cluster_sizes[cluster]
+    inside = (painted_rows < rows) & (painted_cols < cols)
+    forest[painted_rows[inside], painted_cols[inside]] = 4
+    return forest
+
+def add_water_clusters(forest, probability, sigma, threshold, rng):
+    # Smoothed band by band with a halo of the filter radius (gaussian_filter's default truncate of
+    # 4 sigma), which gives exactly the result of one gaussian_filter over the whole grid. Water seeds
+    # are drawn as the bands advance, so only a band and its halos are ever held in memory.
+    rows, cols = forest.shape
+    halo = int(4.0 * sigma + 0.5)
+    water_seeds = np.empty((0, cols), dtype=bool)
+    seeds_start = 0  # Grid row of water_seeds[0]
+    for start, stop in row_bands(rows, cols):
+        low, high = max(0, start - halo), min(rows, stop + halo)
+        drawn = seeds_start + len(water_seeds)
+        if high > drawn:
+            water_seeds = np.concatenate([water_seeds, rng.random((high - drawn, cols)) < probability])
+        water_seeds, seeds_start = water_seeds[low - seeds_start:], low
+        water_layer = gaussian_filter(water_seeds.astype(float), sigma=sigma)[start - low:stop - low] > threshold
+        forest[start:stop][water_layer] = 3
+    return forest
+
+def ignite_random_fire(forest, burn_timers, rng):
+    rows, cols = forest.shape
+    while True:
+        random_row = rng.integers(0, rows)
+        random_col = rng.integers(0, cols)
+        if forest[random_row, random_col] in [1, 6]:
+            forest[random_row, random_col] = 2
+            burn_timers[random_row, random_col] = 10 if forest[random_row, random_col] == 1 else 3
+            break
+    return forest, burn_timers
+
+def count_trees(forest):
+    # Cells of either tree type, counted band by band so a memory-mapped forest is only streamed
+    return sum(int(np.count_nonzero((forest[start:stop] == 1) | (forest[start:stop] == 6)))
+               for start, stop in row_bands(*forest.shape))
+
+# Same steps and settings as the Generate Landscape button
+def generate_landscape(rows, cols, rng, out=None):
+    forest, moisture_map, burn_timers = initialize_forest(rows, cols, rng, out)
+    forest = add_rock_clusters(forest, rng=rng, **ROCK_CLUSTERS)
+    forest = add_water_clusters(forest, rng=rng, **WATER_CLUSTERS)
+    return forest, moisture_map, burn_timers
+
+def landscape_key(rows, cols, master_seed):
+    # Content address of a generated landscape: everything that determines its cells
+    parameters = dict(generator=GENERATOR_VERSION, rows=rows, cols=cols, master_seed=int(master_seed),
+                      rock_clusters=ROCK_CLUSTERS, water_clusters=WATER_CLUSTERS)
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()[:32]
+
+def mapped_file(array):
+    # Path of the .npy file array maps in full (as np.load(..., mmap_mode="r") returns it), else None
+    if not isinstance(array, np.memmap) or array.filename is None or not array.flags.c_contiguous:
+        return None
+    if array.offset + array.nbytes != os.path.getsize(array.filename):
+        return None  # A slice of the mapping, not the whole array
+    return array.filename
+
+def cache_entry(forest, moisture_map, burn_timers):
+    # Directory of the cached_landscape entry these arrays map, or None when they are not one
+    paths = [mapped_file(array) for array in (forest, moisture_map, burn_timers)]
+    if None in paths:
+        return None
+    directory = os.path.dirname(os.path.abspath(paths[0]))
+    expected = [os.path.join(directory, name + ".npy") for name in LANDSCAPE_ARRAYS]
+    return directory if [os.path.abspath(path) for path in paths] == expected else None
+
+def load_cache_entry(directory):
+    return tuple(np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in LANDSCAPE_ARRAYS)
+
+def cached_landscape(rows, cols, master_seed, cache_directory):
+    # Read-only memory maps of the landscape of (rows, cols, master_seed), generated and stored on first use.
+    # An entry is a directory of .npy files, renamed into place once complete, so concurrent
+    # sweeps never see a partial entry and any number of processes can map the same files.
+    # The landscape is generated straight into the files, so it may be larger than memory.
+    directory = os.path.join(cache_directory, landscape_key(rows, cols, master_seed))
+    if not os.path.isdir(directory):
+        partial_directory = f"{directory}.{os.getpid()}.partial"
+        os.makedirs(partial_directory, exist_ok=True)
+        out = tuple(np.lib.format.open_memmap(os.path.join(partial_directory, name + ".npy"), mode="w+",
+                                              dtype=dtype, shape=(rows, cols))
+                    for name, dtype in zip(LANDSCAPE_ARRAYS, (np.uint8, np.float32, np.uint8)))
+        for array in generate_landscape(rows, cols, landscape_rng(master_seed), out):
+            array.flush()
+        del out
+        try:
+            os.rename(partial_directory, directory)
+        except OSError:  # Another process stored the same landscape first
+            shutil.rmtree(partial_directory)
+    return load_cache_entry(directory)
@@ -2,13 +2,28 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.colors as mcolors
-import random
-from scipy.ndimage import gaussian_filter
 import tkinter as tk
+from tkinter import messagebox
 from threading import Thread, Event
 from openpyxl import Workbook, load_workbook
 import os
+import glob
+import traceback
 from itertools import product  # Import for generating all combinations of parameters
+from landscape import initialize_forest, add_rock_clusters, add_water_clusters, ignite_random_fire, cached_landscape
+from seeds import landscape_rng, new_master_seed, simulation_rng, simulation_seed
+from checkpoint import SweepCheckpoint, completed_indices
+from recorder import RunRecordings
+from telemetry import Telemetry
+import engine
+from engine import vectorized_step
+import frontier
+import events
+from sweep import run_sweep
+from planner import planned_seeds, run_planned_sweep
+from replicas import REPLICA_COLUMNS, run_adaptive_sweep
+from result_sinks import open_result_sink, export_to_excel
+from result_store import ResultStore
 
 # Grid dimensions
 rows, cols = 100, 100
@@ -19,6 +34,68 @@ precipitation_strength = 0.6
 precipitation_chance = 0.7
 wind_strength = 0.2
 
+# Step engine: "vectorized" (whole-array NumPy step), "compact" (uint8 state stepped between two
+# preallocated buffers), "frontier" (sparse burning-cell set, for large mostly idle grids),
+# "event" (scheduled burnouts and ignition attempts, statistically equivalent rather than
+# draw-for-draw) or "legacy" (per-cell Python loop)
+step_engine = "vectorized"
+
+# Number of combinations the sweep advances together as one (K, rows, cols) stack; 1 runs them one at a time.
+# With step_engine = "compact", "frontier" or "event" the sweep runs each combination on that engine instead.
+ensemble_size = 256
+
+# Worker processes for the automated sweep; 1 keeps the whole sweep in this process
+sweep_workers = os.cpu_count()
+
+# Simulate each class of combinations with identical effective parameters only samples_per_class
+# times and copy the results to every member row, instead of simulating every combination
+deduplicate_combinations = True
+samples_per_class = 1
+
+# Run replicas of every parameter point until the 95% interval of its mean % burned is within
+# +/- replica_tolerance points (or max_replicas is reached), writing one summary row per combination
+# to ForestFireSimulationReplicas instead of one row per run
+adaptive_replicas = False
+min_replicas = 10
+max_replicas = 200
+replica_tolerance = 1.0
+
+# Where the automated sweep streams its rows: "csv", "columnar", "sqlite", or "excel" for the
+# old per-row save_to_excel. Non-Excel sinks are converted to ForestFireSimulation.xlsx once at the end.
+# A sweep on a new landscape, while files of an earlier one exist, goes to ForestFireSimulation_<seed>.
+result_sink = "csv"
+results_basename = "ForestFireSimulation"
+
+# SQLite result store the pooled sweep also appends every run to, with its seed and landscape
+# fingerprint, for indexed queries and sliced exports (see result_store.py); None keeps only the sink
+result_store_path = None
+
+# Master seed for the landscape and every simulation in the sweep; None draws a fresh one per
+# landscape and prints it, so any sweep can be rerun bit-for-bit with the printed value.
+master_seed = None
+
+# Directory where generated landscapes are stored by size and master seed and memory-mapped on reuse;
+# None generates every landscape afresh
+landscape_cache = None
+
+# Keep a checkpoint (landscape, master seed, grid) next to the results so a killed sweep resumes where
+# it stopped: on start-up the checkpointed landscape is loaded, and the sweep skips combinations that
+# already have a row. False runs without checkpoints and appends to whatever results exist.
+resume_sweep = True
+
+# Seconds between on-disk snapshots of in-flight "compact"/"frontier"/"event" runs in the sweep, so long runs
+# on large grids resume mid-run too; None disables them
+snapshot_interval = None
+
+# Directory where the sweep records every "compact"/"frontier"/"event" run step by step (see recorder.py),
+# with a full-grid keyframe every record_keyframe_interval steps; None records nothing
+record_directory = None
+record_keyframe_interval = 64
+
+# JSON-lines file for sweep telemetry (per-run counters and timings, throughput and ETA, I/O time; see
+# telemetry.py); None leaves the sweep uninstrumented
+telemetry_path = None
+
 # Simulation state
 stop_simulation_event = Event()
 
@@ -26,42 +103,11 @@ stop_simulation_event = Event()
 initial_forest = None
 initial_moisture_map = None
 initial_burn_timers = None
+sweep_seed = None  # Master seed the current landscape and its simulations are derived from
+sweep_name = results_basename  # Basename of the current landscape's sweep files
+sweep_errors = []  # Failures of sweep threads, shown by the Tk thread
 
-def initialize_forest(rows, cols):
-    forest = np.random.choice([1, 6], size=(rows, cols), p=[0.6, 0.4])
-    moisture_map = np.random.rand(rows, cols)
-    burn_timers = np.zeros((rows, cols), dtype=int)
-    return forest, moisture_map, burn_timers
-
-def add_rock_clusters(forest, num_clusters, max_cluster_size):
-    for _ in range(num_clusters):
-        cluster_row = random.randint(0, rows - 1)
-        cluster_col = random.randint(0, cols - 1)
-        cluster_size = random.randint(1, max_cluster_size)
-        for i in range(cluster_size):
-            for j in range(cluster_size):
-                ni, nj = cluster_row + i, cluster_col + j
-                if 0 <= ni < rows and 0 <= nj < cols:
-                    forest[ni, nj] = 4
-    return forest
-
-def add_water_clusters(forest, probability, sigma, threshold):
-    water_layer = np.random.rand(rows, cols) < probability
-    water_layer = gaussian_filter(water_layer.astype(float), sigma=sigma) > threshold
-    forest[water_layer] = 3
-    return forest
-
-def ignite_random_fire(forest, burn_timers):
-    while True:
-        random_row = random.randint(0, rows - 1)
-        random_col = random.randint(0, cols - 1)
-        if forest[random_row, random_col] in [1, 6]:
-            forest[random_row, random_col] = 2
-            burn_timers[random_row, random_col] = 10 if forest[random_row, random_col] == 1 else 3
-            break
-    return forest, burn_timers
-
-def spread_fire(grid, moisture_map, burn_timers, drying_effect, rain_active):
+def spread_fire(grid, moisture_map, burn_timers, drying_effect, rain_active, rng):
     global humidity, precipitation_strength, wind_strength
     new_grid = grid.copy()
     new_moisture = moisture_map.copy()
@@ -87,16 +133,26 @@ def spread_fire(grid, moisture_map, burn_timers, drying_effect, rain_active):
                         ignition_chance = 0.65 - (reduction_factor / 100) + (increase_factor / 100)
                         ignition_chance = max(0, min(1, ignition_chance))
 
-                        if random.random() < ignition_chance:
+                        if rng.random() < ignition_chance:
                             new_grid[ni, nj] = 2
                             new_burn_timers[ni, nj] = 8 if grid[ni, nj] == 1 else 8
 
     new_moisture = np.clip(new_moisture - drying_effect * wind_strength, 0, 1)
     return new_grid, new_moisture, new_burn_timers
 
+def spread_fire_vectorized(grid, moisture_map, burn_timers, drying_effect, rain_active, rng):
+    return vectorized_step(grid, moisture_map, burn_timers, humidity, precipitation_strength, wind_strength,
+                           drying_effect, rain_active, rng)
+
+step_engines = {"legacy": spread_fire, "vectorized": spread_fire_vectorized}
+
+# Engines that keep their own state and run a whole simulation rather than being called once per step
+run_engines = {"compact": engine.run_to_completion, "frontier": frontier.run_to_completion,
+               "event": events.run_to_completion}
+
 # Modified function to save results to Excel and print progress
 def save_to_excel(humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect, burned_cells, burned_percentage, steps_taken, current_simulation, total_combinations):
-    filename = "ForestFireSimulation.xlsx"
+    filename = sweep_name + ".xlsx"
     
     if not os.path.exists(filename):
         # Create a new Excel file if it doesn't exist
@@ -118,31 +174,141 @@ def save_to_excel(humidity, precipitation_strength, precipitation_chance, wind_s
     wb.save(filename)
     print(f"Results saved to {filename} {current_simulation}/{total_combinations}")
 
+# Buffer one result row in the sweep's sink, reporting progress once per flushed batch
+def save_result(sink, humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect, burned_cells, burned_percentage, steps_taken, current_simulation, total_combinations):
+    if sink is None:
+        save_to_excel(humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
+                      burned_cells, burned_percentage, steps_taken, current_simulation, total_combinations)
+        return
+
+    sink.write([humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
+                burned_cells, burned_percentage, steps_taken])
+    if current_simulation % sink.batch_size == 0 or current_simulation == total_combinations:
+        print(f"Results saved to {sink.path} {current_simulation}/{total_combinations}")
+
+def sweep_basename():
+    return sweep_name + "Replicas" if adaptive_replicas else sweep_name
+
+def sweep_files_exist(name):
+    # Results, workbook or checkpoint of a sweep named name (plain or adaptive)
+    return bool(glob.glob(glob.escape(name) + ".*") or glob.glob(glob.escape(name) + "Replicas.*"))
+
+def new_sweep_name(seed):
+    # Basename for the sweep of a newly generated landscape: results_basename while it is unused,
+    # otherwise one named after the landscape's master seed, so earlier sweeps are never mixed in
+    if not sweep_files_exist(results_basename):
+        return results_basename
+    name = f"{results_basename}_{seed}"
+    number = 2
+    while sweep_files_exist(name) and not SweepCheckpoint(name + ("Replicas" if adaptive_replicas else "")).resumable():
+        name = f"{results_basename}_{seed}_{number}"
+        number += 1
+    return name
+
+def unfinished_sweep():
+    # (name, checkpoint) of the most recently checkpointed sweep that did not finish, or None
+    suffix = "Replicas.checkpoint.json" if adaptive_replicas else ".checkpoint.json"
+    candidates = []
+    for path in glob.glob(glob.escape(results_basename) + "*" + suffix):
+        name = path[:-len(suffix)]
+        if not adaptive_replicas and name.endswith("Replicas"):
+            continue
+        checkpoint = SweepCheckpoint(path[:-len(".checkpoint.json")])
+        if checkpoint.resumable():
+            candidates.append((os.path.getmtime(path), name, checkpoint))
+    if not candidates:
+        return None
+    _, name, checkpoint = max(candidates, key=lambda candidate: candidate[0])
+    return name, checkpoint
+
+# Everything besides the seed, landscape and grid that changes a result row
+def sweep_settings(sequential):
+    settings = dict(engine=step_engine if sequential or step_engine in run_engines else "ensemble",
+                    deduplicate=deduplicate_combinations and not sequential, sink=result_sink, adaptive=adaptive_replicas)
+    if adaptive_replicas:
+        settings.update(min_replicas=min_replicas, max_replicas=max_replicas, tolerance=replica_tolerance)
+    elif settings["deduplicate"]:
+        settings.update(samples_per_class=samples_per_class)
+    return settings
+
+def existing_rows(sink, filename):
+    # Rows already saved by this sweep: from its sink, or from the workbook save_to_excel appends to
+    if sink is not None:
+        return list(sink.read_rows())
+    if not os.path.exists(filename):
+        return []
+    return [row for row in load_workbook(filename, read_only=True).active.iter_rows(min_row=2, values_only=True)]
+
+# Start a checkpoint for the current landscape or check the existing one matches it,
+# returning the indices of the combinations that already have a row
+def prepare_checkpoint(combinations, rows, sequential=False):
+    if not resume_sweep:
+        return set()
+    checkpoint = SweepCheckpoint(sweep_basename())
+    if checkpoint.exists():
+        forest, moisture_map, burn_timers, seed = checkpoint.load()
+        if seed != sweep_seed or not (np.array_equal(forest, initial_forest) and np.array_equal(moisture_map, initial_moisture_map)
+                                      and np.array_equal(burn_timers, initial_burn_timers)):
+            raise ValueError(f"{checkpoint.manifest_path} belongs to another landscape. Generate a new landscape "
+                             "to start a new sweep, or move it and its results away.")
+        checkpoint.verify(combinations, sweep_settings(sequential))
+        completed = completed_indices(rows, combinations)
+        print(f"Resuming sweep: {len(completed)}/{len(combinations)} combinations already saved")
+        return completed
+    if rows:
+        raise ValueError(f"Results without a checkpoint already exist for {sweep_basename()}. Generate a new "
+                         "landscape to start a new sweep, or move them away.")
+    checkpoint.start(initial_forest, initial_moisture_map, initial_burn_timers, sweep_seed, combinations,
+                     sweep_settings(sequential))
+    return set()
+
+def finish_checkpoint():
+    # A completed sweep is not resumed on the next start-up
+    if resume_sweep and SweepCheckpoint(sweep_basename()).exists():
+        SweepCheckpoint(sweep_basename()).finish()
+
+def sweep_snapshots():
+    return None if snapshot_interval is None else SweepCheckpoint(sweep_basename()).snapshots(snapshot_interval)
+
+def sweep_telemetry():
+    return None if telemetry_path is None else Telemetry(telemetry_path)
+
+def sweep_recordings():
+    if record_directory is None or step_engine not in run_engines:
+        return None
+    return RunRecordings(record_directory, record_keyframe_interval)
+
 # Modified function to save results with progress
-def run_simulation_without_visuals(forest, moisture_map, burn_timers, drying_effect, current_simulation, total_combinations):
+def run_simulation_without_visuals(forest, moisture_map, burn_timers, drying_effect, current_simulation, total_combinations, sink=None, rng=None):
     global total_trees  # Use the global variable for total trees
 
     if total_trees == 0:  # Safety check in case there are no trees
         raise ValueError("No trees in the landscape to simulate burning.")
 
+    rng = np.random.default_rng() if rng is None else rng
     steps_taken = 0
 
-    while True:
-        rain_active = random.random() < precipitation_chance
-        steps_taken += 1
+    if step_engine in run_engines:
+        burned_cells, steps_taken = run_engines[step_engine](forest, burn_timers, humidity, precipitation_strength,
+                                                             precipitation_chance, wind_strength, drying_effect, rng)
+        print("Fire has stopped spreading.")
+    else:
+        while True:
+            rain_active = rng.random() < precipitation_chance
+            steps_taken += 1
 
-        if np.all(forest != 2):  # No burning cells
-            print("Fire has stopped spreading.")
-            break
+            if np.all(forest != 2):  # No burning cells
+                print("Fire has stopped spreading.")
+                break
 
-        forest, moisture_map, burn_timers = spread_fire(forest, moisture_map, burn_timers, drying_effect, rain_active)
+            forest, moisture_map, burn_timers = step_engines[step_engine](forest, moisture_map, burn_timers, drying_effect, rain_active, rng)
 
-    burned_cells = np.sum(forest == 5)
+        burned_cells = np.sum(forest == 5)
     burned_percentage = (burned_cells / total_trees) * 100  # Divide by total trees
 
-    # Save results to Excel with progress information
-    save_to_excel(humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
-                  burned_cells, burned_percentage, steps_taken, current_simulation, total_combinations)
+    # Save results with progress information
+    save_result(sink, humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect,
+                burned_cells, burned_percentage, steps_taken, current_simulation, total_combinations)
 
 def start_simulation_without_visuals():
     # Check if the landscape has been generated
@@ -155,9 +321,11 @@ def start_simulation_without_visuals():
     burn_timers = initial_burn_timers.copy()
 
     # Ignite a fire and start the simulation
-    forest, burn_timers = ignite_random_fire(forest, burn_timers)
+    rng = np.random.default_rng()
+    forest, burn_timers = ignite_random_fire(forest, burn_timers, rng)
     drying_effect = wind_strength
-    simulation_thread = Thread(target=run_simulation_without_visuals, args=(forest, moisture_map, burn_timers, drying_effect), daemon=True)
+    simulation_thread = Thread(target=run_simulation_without_visuals, args=(forest, moisture_map, burn_timers, drying_effect),
+                               kwargs=dict(rng=rng), daemon=True)
     simulation_thread.start()
 
 # Modified function to run the simulation for all combinations
@@ -170,32 +338,115 @@ def run_simulation_with_all_combinations():
     # Calculate the total number of combinations
     total_combinations = len(values) ** 4
     current_simulation = 0  # Counter for the current simulation
-    
-    # Iterate through all combinations of parameters
-    for humidity_val, precipitation_strength_val, precipitation_chance_val, wind_strength_val in product(values, repeat=4):
-        current_simulation += 1  # Increment the simulation counter
-        
-        # Set the global parameters
-        global humidity, precipitation_strength, precipitation_chance, wind_strength
-        humidity = humidity_val
-        precipitation_strength = precipitation_strength_val
-        precipitation_chance = precipitation_chance_val
-        wind_strength = wind_strength_val
 
-        # Initialize the landscape
-        forest = initial_forest.copy()
-        moisture_map = initial_moisture_map.copy()
-        burn_timers = initial_burn_timers.copy()
-
-        # Ignite a fire
-        forest, burn_timers = ignite_random_fire(forest, burn_timers)
-
-        # Run the simulation
-        drying_effect = wind_strength
-        run_simulation_without_visuals(forest, moisture_map, burn_timers, drying_effect, current_simulation, total_combinations)
+    if adaptive_replicas:
+        run_combinations_with_replicas(list(product(values, repeat=4)), total_combinations)
+        finish_checkpoint()
+        print("Simulations for all parameter combinations completed.")
+        return
+
+    sink = None if result_sink == "excel" else open_result_sink(result_sink, sweep_name)
+    sequential = sweep_workers <= 1 and ensemble_size <= 1
+    completed = prepare_checkpoint(list(product(values, repeat=4)), existing_rows(sink, sweep_name + ".xlsx"),
+                                   sequential)
+
+    if not sequential:
+        run_combinations(list(product(values, repeat=4)), total_combinations, sink, completed)
+    else:
+        # Iterate through all combinations of parameters
+        for humidity_val, precipitation_strength_val, precipitation_chance_val, wind_strength_val in product(values, repeat=4):
+            current_simulation += 1  # Increment the simulation counter
+            if current_simulation - 1 in completed:  # Saved before the sweep was interrupted
+                continue
+
+            # Set the global parameters
+            global humidity, precipitation_strength, precipitation_chance, wind_strength
+            humidity = humidity_val
+            precipitation_strength = precipitation_strength_val
+            precipitation_chance = precipitation_chance_val
+            wind_strength = wind_strength_val
+
+            # Initialize the landscape
+            forest = initial_forest.copy()
+            moisture_map = initial_moisture_map.copy()
+            burn_timers = initial_burn_timers.copy()
+
+            # Ignite a fire, on the same stream the sweep engines use for this combination
+            rng = simulation_rng(sweep_seed, current_simulation - 1)
+            forest, burn_timers = ignite_random_fire(forest, burn_timers, rng)
+
+            # Run the simulation
+            drying_effect = wind_strength
+            run_simulation_without_visuals(forest, moisture_map, burn_timers, drying_effect, current_simulation, total_combinations, sink,
+                                           rng)
+
+    if sink is not None:
+        # One conversion to the Excel layout instead of a workbook rewrite per row
+        export_to_excel(sink, sweep_name + ".xlsx")
+        sink.close()
+    finish_checkpoint()
 
     print("Simulations for all parameter combinations completed.")
 
+# Run the combinations on a pool of sweep_workers processes, or as in-process ensembles of
+# ensemble_size, saving rows as they complete
+def run_combinations(combinations, total_combinations, sink=None, completed=()):
+    current_simulation = len(completed)
+    telemetry = sweep_telemetry()
+    sweep_options = dict(workers=sweep_workers, ensemble_size=ensemble_size,
+                         progress=None if telemetry is None else telemetry.progress,
+                         engine=step_engine if step_engine in run_engines else "ensemble", master_seed=sweep_seed,
+                         completed=completed, snapshots=sweep_snapshots(), recordings=sweep_recordings(),
+                         telemetry=telemetry)
+    save = save_result if telemetry is None else telemetry.timed("io", save_result)
+    store = None if result_store_path is None else ResultStore(result_store_path)
+    try:
+        if deduplicate_combinations:
+            seeds = planned_seeds(combinations, sweep_seed, samples_per_class)
+            results = run_planned_sweep(initial_forest, initial_moisture_map, initial_burn_timers, combinations,
+                                        samples_per_class, **sweep_options)
+        else:
+            seeds = [simulation_seed(sweep_seed, index) for index in range(len(combinations))]
+            results = run_sweep(initial_forest, initial_moisture_map, initial_burn_timers, combinations, **sweep_options)
+        runs = None
+        if store is not None:
+            landscape = store.add_landscape(initial_forest, initial_moisture_map, initial_burn_timers)
+            runs = store.writer(landscape, sweep_seed, sweep_options["engine"], sweep=sweep_basename())
+        for index, (humidity_val, precipitation_strength_val, precipitation_chance_val, wind_strength_val), cells, percentage, steps in results:
+            current_simulation += 1
+            drying_effect = wind_strength_val
+            save(sink, humidity_val, precipitation_strength_val, precipitation_chance_val, wind_strength_val, drying_effect,
+                 cells, percentage, steps, current_simulation, total_combinations)
+            if runs is not None:
+                runs.write(index, (humidity_val, precipitation_strength_val, precipitation_chance_val, wind_strength_val),
+                           cells, percentage, steps, seeds[index])
+        if runs is not None:
+            runs.close()
+    finally:
+        if store is not None:
+            store.close()
+        if telemetry is not None:
+            telemetry.close()
+
+# Run replicas per combination until each one's mean % burned is tight enough, saving one summary row each
+def run_combinations_with_replicas(combinations, total_combinations):
+    with open_result_sink("csv" if result_sink == "excel" else result_sink, sweep_name + "Replicas",
+                          REPLICA_COLUMNS) as sink:
+        completed = prepare_checkpoint(combinations, existing_rows(sink, None))
+        current_simulation = len(completed)
+        summaries = run_adaptive_sweep(initial_forest, initial_moisture_map, initial_burn_timers, combinations,
+                                       min_replicas, max_replicas, replica_tolerance, deduplicate=deduplicate_combinations,
+                                       workers=sweep_workers, ensemble_size=ensemble_size,
+                                       engine=step_engine if step_engine in run_engines else "ensemble",
+                                       master_seed=sweep_seed, completed=completed, snapshots=sweep_snapshots(),
+                                       recordings=sweep_recordings())
+        for _, combination, stats in summaries:
+            current_simulation += 1
+            sink.write(stats.row(combination, 1.96))
+            if current_simulation % sink.batch_size == 0 or current_simulation == total_combinations:
+                print(f"Results saved to {sink.path} {current_simulation}/{total_combinations}")
+        export_to_excel(sink, sweep_name + "Replicas.xlsx")
+
 # Modified button function to trigger the automated simulations
 def start_simulation_with_automation():
     # Check if the landscape has been generated
@@ -203,9 +454,17 @@ def start_simulation_with_automation():
         raise ValueError("Landscape not generated. Please generate the landscape before running simulations.")
     
     # Start the automated simulations in a new thread
-    simulation_thread = Thread(target=run_simulation_with_all_combinations, daemon=True)
+    simulation_thread = Thread(target=run_sweep_reporting_errors, daemon=True)
     simulation_thread.start()
 
+def run_sweep_reporting_errors():
+    # Sweep thread body; a failure is handed to the Tk thread instead of dying with the thread
+    try:
+        run_simulation_with_all_combinations()
+    except Exception as error:
+        traceback.print_exc()
+        sweep_errors.append(error)
+
 # Modify main to use the new automated simulation
 def main():
     global initial_forest, initial_moisture_map, initial_burn_timers, results_window, results_label
@@ -219,14 +478,29 @@ def main():
     canvas = FigureCanvasTkAgg(fig, master=root)
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 
-    def generate_landscape():
+    def generate_landscape(unfinished=None):
         global forest, moisture_map, burn_timers
         global initial_forest, initial_moisture_map, initial_burn_timers, total_trees  # Add total_trees to track the count
-        
-        # Generate the landscape
-        forest, moisture_map, burn_timers = initialize_forest(rows, cols)
-        forest = add_rock_clusters(forest, num_clusters=50, max_cluster_size=5)
-        forest = add_water_clusters(forest, probability=0.15, sigma=3, threshold=0.2)
+        global sweep_seed, sweep_name
+
+        if unfinished is not None:
+            # Continue the interrupted sweep on its own landscape and master seed
+            sweep_name, checkpoint = unfinished
+            forest, moisture_map, burn_timers, sweep_seed = checkpoint.load()
+            print(f"Resuming the sweep checkpointed in {checkpoint.manifest_path}")
+        elif landscape_cache is not None:
+            sweep_seed = new_master_seed() if master_seed is None else master_seed
+            forest, moisture_map, burn_timers = cached_landscape(rows, cols, sweep_seed, landscape_cache)
+        else:
+            # Generate the landscape from the master seed, printed so the sweep can be reproduced
+            sweep_seed = new_master_seed() if master_seed is None else master_seed
+            rng = landscape_rng(sweep_seed)
+            forest, moisture_map, burn_timers = initialize_forest(rows, cols, rng)
+            forest = add_rock_clusters(forest, num_clusters=50, max_cluster_size=5, rng=rng)
+            forest = add_water_clusters(forest, probability=0.15, sigma=3, threshold=0.2, rng=rng)
+        if unfinished is None:
+            sweep_name = new_sweep_name(sweep_seed)
+        print(f"Master seed: {sweep_seed} | Sweep results: {sweep_name}")
         
         # Save the initial state
         initial_forest = forest.copy()
@@ -244,8 +518,15 @@ def main():
         ax.set_title("Generated Landscape")
         canvas.draw()
 
-    forest, moisture_map, burn_timers = initialize_forest(rows, cols)
-    generate_landscape()
+    forest, moisture_map, burn_timers = initialize_forest(rows, cols, np.random.default_rng())
+    generate_landscape(unfinished_sweep() if resume_sweep else None)
+
+    def report_sweep_errors():
+        while sweep_errors:
+            messagebox.showerror("Sweep failed", str(sweep_errors.pop(0)), parent=root)
+        root.after(500, report_sweep_errors)
+
+    report_sweep_errors()
 
     tk.Button(root, text="Generate Landscape", command=generate_landscape, bg="blue", fg="white").pack(side=tk.LEFT, padx=5, pady=5)
     tk.Button(root, text="Start All Simulations", command=start_simulation_with_automation, bg="green", fg="white").pack(side=tk.RIGHT, padx=5, pady=5)
@@ -0,0 +1,81 @@
+from engine import ignition_probability
+from seeds import new_master_seed, simulation_seed
+from sweep import print_progress, run_sweep
+
+# Groups sweep combinations whose dynamics are statistically identical, so each group is
+# simulated once (or samples_per_class times) and its results are fanned out to every member row.
+
+def effective_parameters(humidity, precipitation_strength, precipitation_chance, wind_strength):
+    # Spreading only sees the clipped ignition chance (drying_effect equals wind_strength in the sweep),
+    # rain only matters when precipitation_strength > 0.6, and moisture_map never feeds back.
+    ignition_chance = round(ignition_probability(humidity, precipitation_strength, wind_strength, wind_strength), 12)
+    rain_chance = precipitation_chance if precipitation_strength > 0.6 else 0
+    if rain_chance >= 1:
+        # Every step rains the fire out before it can spread, whatever the ignition chance
+        ignition_chance = 0
+    return ignition_chance, rain_chance
+
+def plan_equivalence_classes(combinations):
+    # Map each effective-parameter key to the indices of its member combinations, in first-seen order
+    classes = {}
+    for index, combination in enumerate(combinations):
+        classes.setdefault(effective_parameters(*combination), []).append(index)
+    return classes
+
+def planned_seeds(combinations, master_seed, samples_per_class=1):
+    # The SeedSequence whose run run_planned_sweep gives each combination's row, by index
+    seeds = [None] * len(combinations)
+    for members in plan_equivalence_classes(combinations).values():
+        for member, index in enumerate(members):
+            seeds[index] = simulation_seed(master_seed, members[0], member % samples_per_class)
+    return seeds
+
+def run_planned_sweep(forest, moisture_map, burn_timers, combinations, samples_per_class=1, cache=None, master_seed=None,
+                      completed=(), progress=print_progress, **sweep_options):
+    # Yield (index, combination, burned_cells, burned_percentage, steps_taken) for every combination,
+    # like run_sweep, while simulating only samples_per_class runs per equivalence class.
+    # Sample j of a class runs the class's first combination with simulation_seed(master_seed, first index, j),
+    # and member m of the class gets sample m % samples_per_class. Pass the same cache dict to later
+    # sweeps on the same landscape and master seed to reuse classes that were already simulated.
+    # Indices in completed are skipped; classes are still planned over the whole grid, so a
+    # resumed sweep gives every remaining row the result it would have had in one pass.
+    combinations = list(combinations)
+    classes = plan_equivalence_classes(combinations)
+    cache = {} if cache is None else cache
+    master_seed = new_master_seed() if master_seed is None else master_seed
+    completed = set(completed)
+    pending = {key: [member for member, index in enumerate(members) if index not in completed]
+               for key, members in classes.items()}
+    classes_left = [key for key in classes if pending[key]]
+    total = sum(len(pending[key]) for key in classes_left)
+    finished = 0
+
+    def fan_out(key):
+        samples = cache[key]
+        for member in pending[key]:
+            index = classes[key][member]
+            cells, percentage, steps = samples[member % samples_per_class]
+            yield index, combinations[index], cells, percentage, steps
+
+    missing = {key: [sample for sample in range(samples_per_class) if sample not in cache.setdefault(key, {})]
+               for key in classes_left}
+    for key in classes_left:
+        if not missing[key]:
+            finished += len(pending[key])
+            yield from fan_out(key)
+
+    # One run of the class's first combination per missing sample
+    representatives = [(key, sample) for key in classes_left for sample in missing[key]]
+    results = run_sweep(forest, moisture_map, burn_timers,
+                        [combinations[classes[key][0]] for key, _ in representatives], progress=None,
+                        seeds=[simulation_seed(master_seed, classes[key][0], sample) for key, sample in representatives],
+                        **sweep_options)
+    for index, _, cells, percentage, steps in results:
+        key, sample = representatives[index]
+        cache[key][sample] = (cells, percentage, steps)
+        missing[key].remove(sample)
+        if not missing[key]:
+            finished += len(pending[key])
+            if progress is not None:
+                progress(finished, total)
+            yield from fan_out(key)
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import struct
+import zlib
+import numpy as np
+
+# Compact per-step recordings of single runs, for auditing sweeps after the fact. A recording is
+# one file: a JSON header, then one compressed record per step. Most records hold only the cells
+# that changed since the previous step (gaps between their flat indices and their new states);
+# every keyframe_interval steps a keyframe holds the whole grid, so a step is rebuilt from the
+# nearest keyframe before it instead of from the start. A closing index lists where every step's
+# record starts; a recording that was never closed (a killed run) is still readable by scanning
+# its record headers.
+#
+#   python recorder.py recordings/run_1_0_0.fire --step 40
+
+MAGIC = b"FIREREC1"
+INDEX_MAGIC = b"FIDX"
+RECORD = struct.Struct("<cIBI")  # kind, step, flags, payload bytes
+TRAILER = struct.Struct("<Q4s")  # offset of the index record, INDEX_MAGIC
+KEYFRAME, DELTA, INDEX = b"K", b"D", b"X"
+RAIN = 1  # flags bit: rain was drawn for this step
+
+class RunRecorder:
+    # Streams the cell states of one run to path, seen at the top of every loop iteration (the
+    # frames the GUI draws). The file is written as path + ".partial" and renamed on close, so a
+    # complete recording is never confused with the remains of a killed run.
+    def __init__(self, path, rows, cols, keyframe_interval=64, metadata=None, compression_level=6):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.compression_level = compression_level
+        self.header = dict(rows=rows, cols=cols, keyframe_interval=keyframe_interval, metadata=metadata or {})
+        self.file = open(path + ".partial", "wb")
+        header = json.dumps(self.header).encode()
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.previous = None  # Copy of the last recorded grid, kept up to date from the deltas
+        self.first_step = None
+        self.index = []  # (step, file offset, flags, keyframe) of every record
+
+    def record(self, step, forest, rain_active=False, changed=None):
+        # Frame of step; steps must be consecutive. The first frame, which is step 0 unless the run
+        # resumed from a snapshot, is always a keyframe. An engine that knows which flat cells its last
+        # step changed (frontier.FrontierSimulation.changed) passes them as changed, so a delta
+        # costs as much as the fire rather than a comparison of the whole grid.
+        flags = RAIN if rain_active else 0
+        if self.first_step is None:
+            self.first_step = step
+        keyframe = (step - self.first_step) % self.keyframe_interval == 0
+        self.index.append((step, self.file.tell(), flags, keyframe))
+        if keyframe:
+            self.previous = np.array(forest, dtype=np.uint8)
+            self.write_record(KEYFRAME, step, flags, self.previous.tobytes())
+            return
+        flat_forest = forest.reshape(-1)
+        if changed is None:
+            changed = np.flatnonzero(flat_forest != self.previous.reshape(-1))
+        else:
+            changed = np.sort(changed)
+        values = flat_forest[changed].astype(np.uint8)
+        self.previous.reshape(-1)[changed] = values
+        gaps = np.diff(changed, prepend=0).astype("<u4")
+        self.write_record(DELTA, step, flags, struct.pack("<I", changed.size) + gaps.tobytes() + values.tobytes())
+
+    def write_record(self, kind, step, flags, data):
+        payload = zlib.compress(data, self.compression_level)
+        self.file.write(RECORD.pack(kind, step, flags, len(payload)))
+        self.file.write(payload)
+
+    def close(self, complete=True):
+        # Write the step index and publish the recording; complete=False leaves the .partial file
+        if self.file.closed:
+            return
+        if complete:
+            index_offset = self.file.tell()
+            self.write_record(INDEX, 0, 0, np.array(self.index, dtype="<u8").reshape(-1, 4).tobytes())
+            self.file.write(TRAILER.pack(index_offset, INDEX_MAGIC))
+        self.file.close()
+        if complete:
+            os.replace(self.path + ".partial", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(complete=exc_type is None)
+
+class RunRecordings:
+    # Recording directory of one sweep; runs are keyed by their SeedSequence spawn key like
+    # checkpoint.RunSnapshots, and the header keeps the seed and parameters of the run
+    def __init__(self, directory, keyframe_interval=64):
+        self.directory = directory
+        self.keyframe_interval = keyframe_interval
+
+    def for_run(self, seed, shape, **metadata):
+        os.makedirs(self.directory, exist_ok=True)
+        name = "run_" + "_".join(str(part) for part in seed.spawn_key) + ".fire"
+        metadata.update(entropy=str(seed.entropy), spawn_key=list(seed.spawn_key))
+        return RunRecorder(os.path.join(self.directory, name), *shape, self.keyframe_interval, metadata)
+
+class Recording:
+    # Random-access player of a recording. frame(step) decodes the nearest keyframe at or before
+    # step and applies the deltas after it, at most keyframe_interval - 1 of them; stepping forward
+    # from the last frame returned only applies the deltas in between.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a fire simulation recording.")
+        header_size, = struct.unpack("<I", self.file.read(4))
+        self.header = json.loads(self.file.read(header_size))
+        self.shape = (self.header["rows"], self.header["cols"])
+        self.metadata = self.header["metadata"]
+        self.records_start = self.file.tell()
+        index = self.read_index()
+        self.offsets = dict(zip(index[:, 0].tolist(), index[:, 1].tolist()))
+        self.flags = dict(zip(index[:, 0].tolist(), index[:, 2].tolist()))
+        self.keyframe_steps = index[index[:, 3] == 1, 0]
+        self.first_step, self.last_step = int(index[0, 0]), int(index[-1, 0])
+        self.current = None  # (step, grid) of the last frame decoded
+
+    def read_index(self):
+        # (step, offset, flags, keyframe) rows of every record: the closing index of a complete
+        # recording, otherwise one pass over the record headers, skipping their payloads
+        end = os.path.getsize(self.path)
+        self.complete = False
+        if end - self.records_start >= TRAILER.size:
+            self.file.seek(end - TRAILER.size)
+            index_offset, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+            if magic == INDEX_MAGIC:
+                self.complete = True
+                self.file.seek(index_offset)
+                _, _, _, size = RECORD.unpack(self.file.read(RECORD.size))
+                index = np.frombuffer(zlib.decompress(self.file.read(size)), dtype="<u8").reshape(-1, 4)
+                return index.astype(np.int64)
+        rows = []
+        offset = self.records_start
+        while offset + RECORD.size <= end:
+            self.file.seek(offset)
+            kind, step, flags, size = RECORD.unpack(self.file.read(RECORD.size))
+            if offset + RECORD.size + size > end:
+                break  # A record cut short by a killed run
+            rows.append((step, offset, flags, kind == KEYFRAME))
+            offset += RECORD.size + size
+        if not rows:
+            raise ValueError(f"{self.path} holds no recorded steps.")
+        return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def rain(self, step):
+        return bool(self.flags[step] & RAIN)
+
+    def read_payload(self, step):
+        self.file.seek(self.offsets[step])
+        kind, _, _, size = RECORD.unpack(self.file.read(RECORD.size))
+        return kind, zlib.decompress(self.file.read(size))
+
+    def apply(self, grid, step):
+        kind, data = self.read_payload(step)
+        if kind == KEYFRAME:
+            grid[...] = np.frombuffer(data, dtype=np.uint8).reshape(self.shape)
+            return
+        count, = struct.unpack_from("<I", data)
+        changed = np.cumsum(np.frombuffer(data, dtype="<u4", count=count, offset=4), dtype=np.int64)
+        grid.reshape(-1)[changed] = np.frombuffer(data, dtype=np.uint8, count=count, offset=4 + 4 * count)
+
+    def frame(self, step):
+        # Cell states at step, as a new array
+        if step not in self.offsets:
+            raise IndexError(f"Step {step} is not in {self.path} (steps {self.first_step}-{self.last_step}).")
+        keyframe = int(self.keyframe_steps[np.searchsorted(self.keyframe_steps, step, side="right") - 1])
+        if self.current is not None and keyframe <= self.current[0] <= step:
+            start, grid = self.current[0] + 1, self.current[1]
+        else:
+            start, grid = keyframe, np.empty(self.shape, dtype=np.uint8)
+        for delta_step in range(start, step + 1):
+            self.apply(grid, delta_step)
+        self.current = (step, grid)
+        return grid.copy()
+
+    def frames(self, start=None, stop=None):
+        # (step, grid) for every step in [start, stop), decoding each record once
+        start = self.first_step if start is None else start
+        stop = self.last_step + 1 if stop is None else stop
+        for step in range(start, stop):
+            yield step, self.frame(step)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+STATE_NAMES = {0: "ground", 1: "tree", 2: "burning", 3: "water", 4: "rock", 5: "burnt", 6: "tree"}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise a recorded simulation run.")
+    parser.add_argument("path", help="Recording (.fire) file")
+    parser.add_argument("--step", type=int, help="Print the cell counts at this step (default: the last one)")
+    args = parser.parse_args(argv)
+    with Recording(args.path) as recording:
+        print(f"{args.path}: {recording.shape[0]}x{recording.shape[1]} grid, steps {recording.first_step}-"
+              f"{recording.last_step}{'' if recording.complete else ' (incomplete)'}")
+        print(f"Run: {json.dumps(recording.metadata)}")
+        step = recording.last_step if args.step is None else args.step
+        counts = np.bincount(recording.frame(step).reshape(-1), minlength=7)
+        summary = {}
+        for state, name in STATE_NAMES.items():
+            summary[name] = summary.get(name, 0) + int(counts[state])
+        print(f"Step {step} | Rain: {'Yes' if recording.rain(step) else 'No'} | "
+              + ", ".join(f"{name} {count}" for name, count in summary.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import math
+from contextlib import nullcontext
+from planner import plan_equivalence_classes
+from seeds import new_master_seed, simulation_seed
+from sweep import SweepPool, run_sweep
+
+# Replica summary rows, one per parameter combination
+REPLICA_COLUMNS = ["Humidity", "Precipitation Strength", "Precipitation Chance", "Wind Strength", "Drying Effect",
+                   "Replicas", "Mean m² Burned", "Std m² Burned", "Mean % Burned", "Std % Burned", "CI % Burned",
+                   "Mean Minutes Taken", "Std Minutes Taken"]
+
+class RunningStats:
+    # Welford's streaming mean and variance
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def half_width(self, z):
+        # Half-width of the normal-approximation confidence interval of the mean
+        return z * self.std / math.sqrt(self.count) if self.count else math.inf
+
+class ReplicaStats:
+    def __init__(self):
+        self.burned_cells = RunningStats()
+        self.burned_percentage = RunningStats()
+        self.steps_taken = RunningStats()
+
+    @property
+    def count(self):
+        return self.burned_percentage.count
+
+    def add(self, burned_cells, burned_percentage, steps_taken):
+        self.burned_cells.add(burned_cells)
+        self.burned_percentage.add(burned_percentage)
+        self.steps_taken.add(steps_taken)
+
+    def replicas_needed(self, tolerance, z):
+        # Replicas at which the current spread would bring the % burned interval within tolerance
+        return math.ceil((z * self.burned_percentage.std / tolerance) ** 2)
+
+    def row(self, combination, z):
+        humidity, precipitation_strength, precipitation_chance, wind_strength = combination
+        drying_effect = wind_strength
+        return [humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect, self.count,
+                self.burned_cells.mean, self.burned_cells.std, self.burned_percentage.mean, self.burned_percentage.std,
+                self.burned_percentage.half_width(z), self.steps_taken.mean, self.steps_taken.std]
+
+def print_replica_progress(finished, total, replicas_run):
+    print(f"Parameter points finished {finished}/{total} ({replicas_run} replicas run)")
+
+def run_adaptive_sweep(forest, moisture_map, burn_timers, combinations, min_replicas=10, max_replicas=200, tolerance=1.0,
+                       z=1.96, deduplicate=True, master_seed=None, completed=(), progress=print_replica_progress,
+                       **sweep_options):
+    # Run replicas per parameter point in rounds and yield (index, combination, ReplicaStats) once a point
+    # stops: when the z-level interval of its mean % burned is within +/- tolerance, or at max_replicas.
+    # Each round asks every open point for as many replicas as its current spread says it needs,
+    # so compute follows the high-variance regions. With deduplicate, the points are the
+    # equivalence classes of planner.plan_equivalence_classes. Replica r of a point uses
+    # simulation_seed(master_seed, first index of the point, r) and results are folded into the
+    # statistics in replica order, so the output is bit-identical whatever the scheduling.
+    # Indices in completed are not yielded again, and points with no other members are not run.
+    combinations = list(combinations)
+    master_seed = new_master_seed() if master_seed is None else master_seed
+    completed = set(completed)
+    if deduplicate:
+        points = list(plan_equivalence_classes(combinations).values())
+    else:
+        points = [[index] for index in range(len(combinations))]
+    points = [members for members in points if any(index not in completed for index in members)]
+    stats = [ReplicaStats() for _ in points]
+    wanted = [min_replicas] * len(points)
+    open_points = list(range(len(points)))
+    finished = 0
+    replicas_run = 0
+
+    # Every round runs on one pool, so workers start and the landscape is published once
+    parallel = sweep_options.get("workers", 1) > 1 and open_points
+    with SweepPool(forest, moisture_map, burn_timers, sweep_options["workers"]) if parallel else nullcontext() as pool:
+        while open_points:
+            batch = [(point, replica) for point in open_points for replica in range(stats[point].count, wanted[point])]
+            results = [None] * len(batch)
+            for index, _, cells, percentage, steps in run_sweep(
+                    forest, moisture_map, burn_timers, [combinations[points[point][0]] for point, _ in batch], progress=None,
+                    seeds=[simulation_seed(master_seed, points[point][0], replica) for point, replica in batch],
+                    pool=pool, **sweep_options):
+                results[index] = (cells, percentage, steps)
+            for (point, _), result in zip(batch, results):
+                stats[point].add(*result)
+            replicas_run += len(batch)
+
+            still_open = []
+            for point in open_points:
+                point_stats = stats[point]
+                if point_stats.burned_percentage.half_width(z) <= tolerance or point_stats.count >= max_replicas:
+                    finished += 1
+                    for index in points[point]:
+                        if index not in completed:
+                            yield index, combinations[index], point_stats
+                else:
+                    wanted[point] = min(max_replicas, max(point_stats.count + 1, point_stats.replicas_needed(tolerance, z)))
+                    still_open.append(point)
+            open_points = still_open
+
+            if progress is not None:
+                progress(finished, len(points), replicas_run)
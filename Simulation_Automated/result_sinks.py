@@ -0,0 +1,176 @@
+import csv
+import json
+import os
+import sqlite3
+import numpy as np
+from openpyxl import Workbook
+
+# Same header row save_to_excel writes
+RESULT_COLUMNS = ["Humidity", "Precipitation Strength", "Precipitation Chance", "Wind Strength", "Drying Effect",
+                  "Total m² Burned", "% Burned", "Total Minutes Taken"]
+
+class ResultSink:
+    # Buffers result rows and appends them to the backend batch_size rows at a time.
+    # Subclasses implement append_rows and read_rows.
+    extension = ""
+
+    def __init__(self, path, columns=RESULT_COLUMNS, batch_size=1000):
+        self.path = path
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.buffer = []
+        self.rows_written = 0
+
+    def write(self, row):
+        self.buffer.append(list(row))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.append_rows(self.buffer)
+            self.rows_written += len(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    def append_rows(self, rows):
+        raise NotImplementedError
+
+    def read_rows(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CsvSink(ResultSink):
+    extension = ".csv"
+
+    def __init__(self, path, columns=RESULT_COLUMNS, batch_size=1000):
+        super().__init__(path, columns, batch_size)
+        if os.path.exists(path):
+            self.drop_partial_row()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(self.columns)
+            self.file.flush()
+
+    def drop_partial_row(self):
+        # A crash mid-batch can leave a final line without its newline; cut it so appends stay aligned
+        with open(self.path, "rb+") as file:
+            content = file.read()
+            if not content.endswith(b"\n"):
+                file.truncate(content.rfind(b"\n") + 1)
+
+    def append_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())  # A flushed batch survives the machine going away, not just the process
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+    def read_rows(self):
+        with open(self.path, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader, None)  # Header
+            for row in reader:
+                yield [float(value) for value in row]
+
+class ColumnarSink(ResultSink):
+    # One raw float64 file per column in a directory, so a column can be read back
+    # (or memory-mapped) on its own with np.fromfile / np.memmap
+    extension = ".columns"
+
+    def __init__(self, path, columns=RESULT_COLUMNS, batch_size=1000):
+        super().__init__(path, columns, batch_size)
+        os.makedirs(path, exist_ok=True)
+        schema_path = os.path.join(path, "columns.json")
+        if os.path.exists(schema_path):
+            with open(schema_path, encoding="utf-8") as file:
+                if json.load(file) != self.columns:
+                    raise ValueError(f"{path} holds results with different columns.")
+        else:
+            with open(schema_path, "w", encoding="utf-8") as file:
+                json.dump(self.columns, file)
+        self.drop_partial_rows()
+
+    def column_path(self, index):
+        return os.path.join(self.path, f"column_{index}.f8")
+
+    def drop_partial_rows(self):
+        # Cut every column back to the rows all of them hold, so new rows do not land misaligned
+        paths = [self.column_path(index) for index in range(len(self.columns))]
+        length = min(os.path.getsize(path) if os.path.exists(path) else 0 for path in paths) // 8
+        for path in paths:
+            if os.path.exists(path) and os.path.getsize(path) > length * 8:
+                os.truncate(path, length * 8)
+
+    def append_rows(self, rows):
+        block = np.asarray(rows, dtype="<f8")
+        for index in range(len(self.columns)):
+            with open(self.column_path(index), "ab") as file:
+                file.write(block[:, index].tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+
+    def read_columns(self):
+        columns = [np.fromfile(self.column_path(index), dtype="<f8") if os.path.exists(self.column_path(index))
+                   else np.empty(0) for index in range(len(self.columns))]
+        # A crash mid-batch can leave some columns a few rows longer than others
+        length = min(len(column) for column in columns)
+        return [column[:length] for column in columns]
+
+    def read_rows(self):
+        yield from np.column_stack(self.read_columns()).tolist()
+
+class SqliteSink(ResultSink):
+    extension = ".sqlite"
+
+    def __init__(self, path, columns=RESULT_COLUMNS, batch_size=1000):
+        super().__init__(path, columns, batch_size)
+        self.connection = sqlite3.connect(path)
+        column_sql = ", ".join(f'"{column}" REAL' for column in self.columns)
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS results ({column_sql})")
+        self.connection.commit()
+
+    def append_rows(self, rows):
+        placeholders = ", ".join("?" for _ in self.columns)
+        self.connection.executemany(f"INSERT INTO results VALUES ({placeholders})", rows)
+        self.connection.commit()
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+    def read_rows(self):
+        column_sql = ", ".join(f'"{column}"' for column in self.columns)
+        for row in self.connection.execute(f"SELECT {column_sql} FROM results ORDER BY rowid"):
+            yield list(row)
+
+result_sinks = {"csv": CsvSink, "columnar": ColumnarSink, "sqlite": SqliteSink}
+
+def open_result_sink(kind, basename, columns=RESULT_COLUMNS, batch_size=1000):
+    sink_class = result_sinks[kind]
+    return sink_class(basename + sink_class.extension, columns, batch_size)
+
+def export_to_excel(sink, filename="ForestFireSimulation.xlsx"):
+    # One write-only pass over everything the sink holds, in the save_to_excel layout
+    sink.flush()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Simulation Results")
+    ws.append(sink.columns)
+    exported_rows = 0
+    for row in sink.read_rows():
+        # Whole numbers go back to ints, as the sweep wrote them originally
+        ws.append([int(value) if float(value).is_integer() else value for value in row])
+        exported_rows += 1
+    wb.save(filename)
+    print(f"Results exported to {filename} ({exported_rows} rows)")
@@ -0,0 +1,261 @@
+import argparse
+import math
+import sqlite3
+import time
+from checkpoint import landscape_fingerprint
+from landscape import count_trees
+from planner import effective_parameters
+from result_sinks import RESULT_COLUMNS, export_to_excel
+
+# Queryable store of sweep results: one SQLite row per combination of a sweep with its parameters,
+# the seed of the run that gave its result (master seed and SeedSequence spawn key), the
+# fingerprint of its landscape and its metrics. A deduplicated sweep runs one simulation per
+# equivalence class (planner.py) and gives its result to every member, so several rows can share
+# one run; they also share its spawn key and equivalence class, and aggregate() and count() count
+# each run once. The parameter columns are indexed, so a slice or an aggregate of a large sweep
+# ("% burned by wind strength at humidity 0.3") reads only the matching rows instead of a whole
+# workbook. The database runs in WAL mode and every batch is one immediate transaction, so any
+# number of processes can append to the same file while others query it.
+#
+#   python result_store.py results.db --where humidity=0.3 --by wind_strength
+#   python result_store.py results.db --where humidity=0.3 wind_strength=0.2:0.6 --excel slice.xlsx
+
+PARAMETER_COLUMNS = ["humidity", "precipitation_strength", "precipitation_chance", "wind_strength"]
+METRIC_COLUMNS = ["burned_cells", "burned_percentage", "steps_taken"]
+# Store columns of the save_to_excel layout, in RESULT_COLUMNS order
+EXCEL_COLUMNS = PARAMETER_COLUMNS + ["drying_effect"] + METRIC_COLUMNS
+RUN_COLUMNS = ["sweep", "combination"] + EXCEL_COLUMNS + ["engine", "master_seed", "spawn_key", "landscape", "recorded",
+                                                             "equivalence_class"]
+# The simulation behind a row: the same seed on the same landscape and engine with the same effective
+# parameters. Rows stored before equivalence_class existed each count as their own run.
+RUN_IDENTITY = "landscape, master_seed, spawn_key, engine, COALESCE(equivalence_class, id)"
+# Parameters are compared within this distance, so grids built with np.linspace or arithmetic
+# still match the values typed in a query
+PARAMETER_TOLERANCE = 1e-9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS landscapes (
+    fingerprint TEXT PRIMARY KEY, rows INTEGER, cols INTEGER, trees INTEGER
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    sweep TEXT, combination INTEGER,
+    humidity REAL, precipitation_strength REAL, precipitation_chance REAL, wind_strength REAL, drying_effect REAL,
+    burned_cells INTEGER, burned_percentage REAL, steps_taken INTEGER,
+    engine TEXT, master_seed TEXT, spawn_key TEXT, landscape TEXT REFERENCES landscapes (fingerprint),
+    recorded REAL,
+    equivalence_class TEXT  -- planner.effective_parameters of the combination
+);
+CREATE INDEX IF NOT EXISTS runs_parameters
+    ON runs (humidity, precipitation_strength, precipitation_chance, wind_strength);
+CREATE INDEX IF NOT EXISTS runs_precipitation_strength ON runs (precipitation_strength);
+CREATE INDEX IF NOT EXISTS runs_precipitation_chance ON runs (precipitation_chance);
+CREATE INDEX IF NOT EXISTS runs_wind_strength ON runs (wind_strength);
+CREATE INDEX IF NOT EXISTS runs_sweep ON runs (sweep, combination);
+-- The same seed on the same landscape, engine and parameters is the same run: appending it again
+-- (a resumed sweep re-running a row that never reached its sink) is a no-op
+CREATE UNIQUE INDEX IF NOT EXISTS runs_identity
+    ON runs (landscape, master_seed, spawn_key, engine, humidity, precipitation_strength, precipitation_chance,
+             wind_strength);
+"""
+
+class ResultStore:
+    # One connection to the store at path; open one per process (connections do not pickle)
+    def __init__(self, path, timeout=60.0):
+        self.path = path
+        # Autocommit mode, so the transactions below are exactly the ones this class begins
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; a power cut may lose the last batch
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]
+        if "equivalence_class" not in columns:  # A store created before the column
+            self.connection.execute("ALTER TABLE runs ADD COLUMN equivalence_class TEXT")
+
+    def add_landscape(self, forest, moisture_map, burn_timers):
+        # Fingerprint of the landscape, recorded with its size and tree count
+        fingerprint = landscape_fingerprint(forest, moisture_map, burn_timers)
+        self.record_landscape(fingerprint, *forest.shape, count_trees(forest))
+        return fingerprint
+
+    def record_landscape(self, fingerprint, rows, cols, trees):
+        # For landscapes fingerprinted elsewhere (a job server's workers)
+        self.connection.execute("INSERT OR IGNORE INTO landscapes VALUES (?, ?, ?, ?)", (fingerprint, rows, cols, trees))
+
+    def writer(self, landscape, master_seed, engine, sweep="", batch_size=1000):
+        return RunWriter(self, landscape, master_seed, engine, sweep, batch_size)
+
+    def append(self, rows):
+        # Rows of RUN_COLUMNS values, in one transaction. BEGIN IMMEDIATE takes the write lock up front,
+        # so concurrent writers queue on the busy timeout instead of failing mid-transaction.
+        placeholders = ", ".join("?" for _ in RUN_COLUMNS)
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.executemany(f"INSERT OR IGNORE INTO runs ({', '.join(RUN_COLUMNS)}) "
+                                        f"VALUES ({placeholders})", rows)
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def where(self, filters):
+        # SQL condition and arguments of filters: column=value, or column=(low, high) for an
+        # inclusive range; parameter values match within PARAMETER_TOLERANCE
+        conditions, arguments = [], []
+        for column, value in filters.items():
+            if column not in RUN_COLUMNS:
+                raise ValueError(f"Unknown run column {column}; expected one of {', '.join(RUN_COLUMNS)}.")
+            if isinstance(value, (tuple, list)):
+                low, high = value
+            elif column in EXCEL_COLUMNS:
+                low, high = value, value
+            else:
+                conditions.append(f"{column} = ?")
+                arguments.append(value)
+                continue
+            if column in EXCEL_COLUMNS:
+                low, high = float(low) - PARAMETER_TOLERANCE, float(high) + PARAMETER_TOLERANCE
+            conditions.append(f"{column} BETWEEN ? AND ?")
+            arguments.extend([low, high])
+        return " AND ".join(conditions) or "1", arguments
+
+    def runs(self, columns=EXCEL_COLUMNS, **filters):
+        # Rows of columns for every run matching filters, in the order they were recorded
+        for column in columns:
+            if column not in RUN_COLUMNS:
+                raise ValueError(f"Unknown run column {column}; expected one of {', '.join(RUN_COLUMNS)}.")
+        condition, arguments = self.where(filters)
+        yield from self.connection.execute(f"SELECT {', '.join(columns)} FROM runs WHERE {condition} ORDER BY id",
+                                           arguments)
+
+    def count(self, **filters):
+        # Distinct runs among the rows matching filters
+        condition, arguments = self.where(filters)
+        return self.connection.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT {RUN_IDENTITY} FROM runs "
+                                       f"WHERE {condition})", arguments).fetchone()[0]
+
+    def aggregate(self, by=(), metric="burned_percentage", **filters):
+        # One dict per distinct value of the by columns among the runs matching filters: the by
+        # values and the count, mean, standard deviation, min and max of metric. Rows sharing a run
+        # (members of one equivalence class in the same group) are one sample.
+        for column in list(by) + [metric]:
+            if column not in RUN_COLUMNS:
+                raise ValueError(f"Unknown run column {column}; expected one of {', '.join(RUN_COLUMNS)}.")
+        condition, arguments = self.where(filters)
+        groups = ", ".join(by)
+        distinct_runs = f"SELECT DISTINCT {groups + ', ' if by else ''}{RUN_IDENTITY}, {metric} FROM runs WHERE {condition}"
+        query = (f"SELECT {groups + ', ' if by else ''}COUNT({metric}), AVG({metric}), AVG({metric} * {metric}), "
+                 f"MIN({metric}), MAX({metric}) FROM ({distinct_runs})")
+        if by:
+            query += f" GROUP BY {groups} ORDER BY {groups}"
+        summaries = []
+        for row in self.connection.execute(query, arguments):
+            count, mean, mean_square, low, high = row[len(by):]
+            if not count:
+                continue
+            variance = max(mean_square - mean * mean, 0.0) * count / (count - 1) if count > 1 else 0.0
+            summaries.append(dict(zip(by, row[:len(by)]), count=count, mean=mean, std=math.sqrt(variance),
+                                  min=low, max=high))
+        return summaries
+
+    def slice(self, **filters):
+        return StoreSlice(self, filters)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class RunWriter:
+    # Buffers the runs of one sweep and appends them batch_size at a time, like a result sink
+    def __init__(self, store, landscape, master_seed, engine, sweep="", batch_size=1000):
+        self.store = store
+        self.landscape = landscape
+        self.master_seed = str(master_seed)  # SeedSequence entropy can exceed SQLite's 64-bit integers
+        self.engine = engine
+        self.sweep = sweep
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def write(self, index, combination, burned_cells, burned_percentage, steps_taken, seed):
+        # A sweep result tuple and the SeedSequence its run drew from
+        humidity, precipitation_strength, precipitation_chance, wind_strength = combination
+        drying_effect = wind_strength
+        equivalence_class = ",".join(repr(float(value)) for value in effective_parameters(*combination))
+        self.buffer.append((self.sweep, index, humidity, precipitation_strength, precipitation_chance, wind_strength,
+                            drying_effect, burned_cells, burned_percentage, steps_taken, self.engine, self.master_seed,
+                            ",".join(str(part) for part in seed.spawn_key), self.landscape, time.time(),
+                            equivalence_class))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.store.append(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class StoreSlice:
+    # The runs matching filters, in the save_to_excel layout; export_to_excel takes it like a result sink
+    def __init__(self, store, filters):
+        self.store = store
+        self.filters = filters
+        self.columns = list(RESULT_COLUMNS)
+
+    def flush(self):
+        pass
+
+    def read_rows(self):
+        yield from self.store.runs(EXCEL_COLUMNS, **self.filters)
+
+def parse_filter(text):
+    # "column=value" or "column=low:high"
+    column, _, value = text.partition("=")
+    if not value:
+        raise argparse.ArgumentTypeError(f"Expected column=value or column=low:high, not {text}.")
+    if ":" in value:
+        low, high = value.split(":")
+        return column, (float(low), float(high))
+    try:
+        return column, float(value)
+    except ValueError:
+        return column, value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or export the runs in a sweep result store.")
+    parser.add_argument("path", help="Result store (.db) file")
+    parser.add_argument("--where", nargs="*", type=parse_filter, default=[],
+                        help="Filters, e.g. humidity=0.3 wind_strength=0.2:0.6 engine=frontier")
+    parser.add_argument("--by", nargs="*", default=[], help="Columns to group by, e.g. wind_strength")
+    parser.add_argument("--metric", default="burned_percentage", help="Column to aggregate (default burned_percentage)")
+    parser.add_argument("--excel", help="Export the matching runs to this .xlsx file in the save_to_excel layout")
+    args = parser.parse_args(argv)
+    filters = dict(args.where)
+    with ResultStore(args.path) as store:
+        if args.excel:
+            export_to_excel(store.slice(**filters), args.excel)
+            return
+        started = time.perf_counter()
+        summaries = store.aggregate(args.by, args.metric, **filters)
+        seconds = time.perf_counter() - started
+        print("  ".join(f"{name:>12}" for name in args.by + ["runs", "mean", "std", "min", "max"]))
+        for summary in summaries:
+            values = [summary[name] for name in args.by] + [summary["count"]]
+            values += [f"{summary[name]:.3f}" for name in ("mean", "std", "min", "max")]
+            print("  ".join(f"{value:>12}" for value in values))
+        print(f"{len(summaries)} group(s) of {args.metric} in {seconds * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import numpy as np
+
+# Every random draw in a sweep comes from a generator derived from one master seed through
+# SeedSequence spawn keys, so a simulation's stream depends only on (master seed, combination
+# index, replica) and never on which worker, chunk or ensemble ran it.
+
+LANDSCAPE_STREAM = 0
+SIMULATION_STREAM = 1
+
+def new_master_seed():
+    # Fresh OS entropy, returned as a plain int so it can be printed and passed back in later
+    return np.random.SeedSequence().entropy
+
+def landscape_seed(master_seed):
+    return np.random.SeedSequence(master_seed, spawn_key=(LANDSCAPE_STREAM,))
+
+def simulation_seed(master_seed, index, replica=0):
+    return np.random.SeedSequence(master_seed, spawn_key=(SIMULATION_STREAM, index, replica))
+
+def landscape_rng(master_seed):
+    return np.random.default_rng(landscape_seed(master_seed))
+
+def simulation_rng(master_seed, index, replica=0):
+    return np.random.default_rng(simulation_seed(master_seed, index, replica))
@@ -0,0 +1,206 @@
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from engine import run_to_completion as run_compact
+from ensemble import run_ensemble
+import events
+import frontier
+import tiled
+from landscape import count_trees, ignite_random_fire, mapped_file
+from seeds import new_master_seed, simulation_seed
+
+# Views of the published landscape inside a worker process, filled in by attach_landscape
+worker_landscape = {}
+worker_blocks = []
+
+class SharedLandscape:
+    # Copies the landscape arrays into shared memory once so pool workers map them
+    # instead of receiving a pickled copy with every task. Arrays already memory-mapped from
+    # .npy files (landscape.cached_landscape) are not copied; workers map the same files.
+    def __init__(self, **arrays):
+        self.blocks = []
+        self.spec = {}
+        for name, array in arrays.items():
+            path = mapped_file(array)
+            if path is not None:
+                self.spec[name] = (path, None, None)  # shape None: a .npy path rather than a segment name
+                continue
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach_landscape(spec):
+    # Pool initializer: map every published array read-only in this worker.
+    # The parent created the segments before starting the pool, so it alone unlinks them.
+    for name, (source, shape, dtype) in spec.items():
+        if shape is None:
+            worker_landscape[name] = np.load(source, mmap_mode="r")
+            continue
+        block = shared_memory.SharedMemory(name=source)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        view.flags.writeable = False
+        worker_blocks.append(block)
+        worker_landscape[name] = view
+
+# Per-run engines; anything else runs as an ensemble
+run_engines = {"compact": run_compact, "frontier": frontier.run_to_completion, "event": events.run_to_completion}
+
+# Per-run engines that read the shared landscape themselves and ignite their own copy, so a
+# memory-mapped landscape is never copied into memory whole
+landscape_engines = {"tiled": tiled.run_on_landscape}
+
+def simulate_chunk(forest, burn_timers, chunk, engine="ensemble", snapshots=None, engine_options=None,
+                   recordings=None, telemetry=None):
+    # chunk is a list of (index, (humidity, precipitation_strength, precipitation_chance, wind_strength), seed).
+    # "ensemble" runs the chunk together as one stacked array; "compact", "frontier" and "event" run each
+    # combination on its own, on the double-buffered uint8 engine, the sparse burning-cell engine or
+    # the event-driven engine.
+    # Every run draws only from the generator of its own SeedSequence, so its result does not
+    # depend on how the combinations were chunked or which worker ran them. With a
+    # checkpoint.RunSnapshots the per-run engines snapshot long runs and resume them from disk.
+    # "tiled" runs each combination out of core; engine_options are passed on to it (tile_size, workers, directory).
+    # With a recorder.RunRecordings every compact, frontier or event run is recorded step by step, and with
+    # a telemetry.Telemetry every per-run engine reports its counters and timings (an ensemble, its chunk's).
+    indices = [index for index, _, _ in chunk]
+    parameters = [combination for _, combination, _ in chunk]
+    seeds = [seed for _, _, seed in chunk]
+    if engine in run_engines or engine in landscape_engines:
+        total_trees = count_trees(forest)
+        burned_cells, steps_taken = [], []
+        for (humidity, precipitation_strength, precipitation_chance, wind_strength), seed in zip(parameters, seeds):
+            rng = np.random.default_rng(seed)
+            run = dict(engine=engine, humidity=humidity, precipitation_strength=precipitation_strength,
+                       precipitation_chance=precipitation_chance, wind_strength=wind_strength)
+            options = {}
+            if telemetry is not None:
+                options["telemetry"] = telemetry.run(spawn_key=list(seed.spawn_key), **run)
+            if engine in landscape_engines:
+                cells, steps = landscape_engines[engine](forest, burn_timers, humidity, precipitation_strength,
+                                                         precipitation_chance, wind_strength, wind_strength, rng,
+                                                         **(engine_options or {}), **options)
+                burned_cells.append(cells)
+                steps_taken.append(steps)
+                continue
+            run_forest, run_burn_timers = ignite_random_fire(forest.copy(), burn_timers.copy(), rng)
+            options["snapshot"] = None if snapshots is None else snapshots.for_run(seed)
+            with nullcontext() if recordings is None else recordings.for_run(seed, forest.shape, **run) as recorder:
+                cells, steps = run_engines[engine](run_forest, run_burn_timers, humidity, precipitation_strength,
+                                                   precipitation_chance, wind_strength, wind_strength, rng,
+                                                   recorder=recorder, **options)
+            burned_cells.append(cells)
+            steps_taken.append(steps)
+        burned_percentage = (np.array(burned_cells) / total_trees) * 100
+    else:
+        started = time.perf_counter()
+        burned_cells, burned_percentage, steps_taken = run_ensemble(forest, burn_timers, parameters, seeds)
+        if telemetry is not None:
+            telemetry.event("ensemble", members=len(chunk), seconds=time.perf_counter() - started,
+                            steps_max=int(np.max(steps_taken)), steps_mean=float(np.mean(steps_taken)))
+    return [(index, combination, int(cells), float(percentage), int(steps))
+            for index, combination, cells, percentage, steps in zip(indices, parameters, burned_cells,
+                                                                     burned_percentage, steps_taken)]
+
+def run_chunk(chunk, engine, snapshots=None, engine_options=None, recordings=None, telemetry=None):
+    return simulate_chunk(worker_landscape["forest"], worker_landscape["burn_timers"], chunk, engine, snapshots,
+                          engine_options, recordings, telemetry)
+
+def print_progress(completed, total):
+    print(f"Simulations completed {completed}/{total}")
+
+class SweepPool:
+    # Process pool whose workers have the landscape attached. Kept open across several batches of
+    # runs (the rounds of replicas.run_adaptive_sweep), so workers start and the landscape is
+    # published once rather than per batch.
+    def __init__(self, forest, moisture_map, burn_timers, workers=None):
+        self.landscape = SharedLandscape(forest=forest, moisture_map=moisture_map, burn_timers=burn_timers)
+        try:
+            self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=attach_landscape,
+                                            initargs=(self.landscape.spec,))
+        except BaseException:
+            self.landscape.close()
+            raise
+
+    def run(self, runs, chunk_size=64, progress=print_progress, engine="ensemble", snapshots=None, engine_options=None,
+            recordings=None, telemetry=None):
+        # Spread the (index, combination, seed) runs over the pool and yield
+        # (index, combination, burned_cells, burned_percentage, steps_taken) in completion order
+        chunks = [runs[start:start + chunk_size] for start in range(0, len(runs), chunk_size)]
+        completed = 0
+        futures = [self.pool.submit(run_chunk, chunk, engine, snapshots, engine_options, recordings, telemetry)
+                   for chunk in chunks]
+        try:
+            for future in as_completed(futures):
+                results = future.result()
+                completed += len(results)
+                if progress is not None:
+                    progress(completed, len(runs))
+                yield from results
+        finally:
+            for future in futures:  # Left behind by a caller that stopped early; the pool outlives this batch
+                future.cancel()
+
+    def close(self):
+        self.pool.shutdown()
+        self.landscape.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_parallel_sweep(forest, moisture_map, burn_timers, runs, workers=None, chunk_size=64, progress=print_progress,
+                       engine="ensemble", snapshots=None, engine_options=None, recordings=None, telemetry=None):
+    # SweepPool.run on a pool of its own
+    with SweepPool(forest, moisture_map, burn_timers, workers) as pool:
+        yield from pool.run(runs, chunk_size, progress, engine, snapshots, engine_options, recordings, telemetry)
+
+def run_sweep(forest, moisture_map, burn_timers, combinations, workers=1, ensemble_size=256, progress=print_progress,
+              engine="ensemble", master_seed=None, seeds=None, completed=(), snapshots=None, engine_options=None,
+              recordings=None, telemetry=None, pool=None):
+    # Yield (index, combination, burned_cells, burned_percentage, steps_taken) for every combination
+    # whose index is not in completed, from a process pool when workers > 1 (pool, an open SweepPool
+    # on the same landscape, instead of a new one), otherwise from in-process ensembles of ensemble_size. Run i uses seeds[i], by default
+    # simulation_seed(master_seed, i); results are bit-identical for the same seeds whatever
+    # workers, ensemble_size, completion order or which runs a resumed sweep skips.
+    # recordings (a recorder.RunRecordings) needs a per-run engine, compact, frontier or event.
+    if recordings is not None and engine not in run_engines:
+        raise ValueError(f"Runs can only be recorded on the {' or '.join(run_engines)} engine, not {engine}.")
+    combinations = list(combinations)
+    if seeds is None:
+        master_seed = new_master_seed() if master_seed is None else master_seed
+        seeds = [simulation_seed(master_seed, index) for index in range(len(combinations))]
+    completed = set(completed)
+    runs = [(index, combinations[index], seeds[index]) for index in range(len(combinations)) if index not in completed]
+
+    if pool is not None:
+        yield from pool.run(runs, min(64, ensemble_size), progress, engine, snapshots, engine_options, recordings,
+                            telemetry)
+        return
+    if workers > 1:
+        yield from run_parallel_sweep(forest, moisture_map, burn_timers, runs, workers, min(64, ensemble_size),
+                                      progress, engine, snapshots, engine_options, recordings, telemetry)
+        return
+
+    for start in range(0, len(runs), ensemble_size):
+        chunk = runs[start:start + ensemble_size]
+        yield from simulate_chunk(forest, burn_timers, chunk, engine, snapshots, engine_options, recordings, telemetry)
+        if progress is not None:
+            progress(start + len(chunk), len(runs))
@@ -0,0 +1,228 @@
+import json
+import os
+from multiprocessing import util
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Opt-in instrumentation of sweeps. Nothing here runs unless a Telemetry is passed in: engines and
+# sweeps take telemetry=None and only branch on it once per run, so a disabled sweep pays nothing
+# per step. When enabled, every process appends JSON lines to one metrics file:
+#
+#   {"event": "run", ...}       one per simulated run: steps, peak burning cells, ignitions per step,
+#                               seconds spent stepping and checking for termination
+#   {"event": "progress", ...}  sweep throughput and ETA, at most every interval seconds
+#   {"event": "profile", ...}   collapsed stacks from the sampling profiler (flamegraph.pl input)
+#   {"event": "summary", ...}   phase totals of the sweeping process (I/O, export) at the end
+
+# Telemetry of this process by settings, when it was unpickled in a pool worker
+worker_telemetry = {}
+
+def shared_telemetry(path, interval, profile_interval, echo):
+    # Unpickling target of Telemetry: every task a worker runs gets the same instance, so the
+    # worker holds one metrics file descriptor and at most one sampler thread however many
+    # chunks it is sent. It is released when the worker exits.
+    key = (os.getpid(), path, interval, profile_interval, echo)  # Not an instance inherited through fork
+    telemetry = worker_telemetry.get(key)
+    if telemetry is None:
+        telemetry = worker_telemetry[key] = Telemetry(path, interval, profile_interval, echo)
+        # multiprocessing runs finalizers with an exit priority when a worker process exits,
+        # which atexit handlers do not get to do in forked children
+        util.Finalize(None, telemetry.release, exitpriority=10)
+    return telemetry
+
+class Telemetry:
+    # Picklable, so it travels to pool workers like checkpoint.RunSnapshots; each process opens
+    # the metrics file itself (once, see shared_telemetry) and writes every event with a single
+    # O_APPEND write, which keeps lines from different processes whole
+    def __init__(self, path, interval=5.0, profile_interval=None, echo=True):
+        self.path = path
+        self.interval = interval
+        self.profile_interval = profile_interval
+        self.echo = echo
+        self.reset()
+
+    def reset(self):
+        self.fd = None
+        self.sampler = None
+        self.phases = Counter()
+        self.started = time.perf_counter()
+        self.last_progress = None
+
+    def __reduce__(self):
+        return shared_telemetry, (self.path, self.interval, self.profile_interval, self.echo)
+
+    def event(self, kind, **fields):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        record = dict(event=kind, time=time.time(), pid=os.getpid(), **fields)
+        os.write(self.fd, (json.dumps(record) + "\n").encode())
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def timed(self, name, function):
+        # function, with the time spent in it added to phase name
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.phases[name] += time.perf_counter() - start
+        return timed_function
+
+    def run(self, **fields):
+        # Telemetry of one simulated run, which the engine's run_to_completion reports through
+        if self.profile_interval and self.sampler is None:
+            self.sampler = StackSampler(self.profile_interval)
+            self.sampler.start()
+        return RunTelemetry(self, fields)
+
+    def progress(self, completed, total, replicas_run=None):
+        # Progress callback for the sweeps: prints and logs throughput and ETA, at most every
+        # interval seconds and always at the end
+        now = time.perf_counter()
+        if completed < total and self.last_progress is not None and now - self.last_progress < self.interval:
+            return
+        self.last_progress = now
+        elapsed = now - self.started
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        eta = (total - completed) / rate if rate > 0 else None
+        fields = dict(completed=completed, total=total, elapsed=elapsed, rate=rate, eta=eta)
+        if replicas_run is not None:
+            fields["replicas_run"] = replicas_run
+        self.event("progress", **fields)
+        if self.echo:
+            remaining = "unknown" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+            print(f"Completed {completed}/{total} | {rate:.2f}/s | ETA {remaining}")
+        self.flush_profile()
+
+    def flush_profile(self):
+        if self.sampler is not None:
+            stacks = self.sampler.drain()
+            if stacks:
+                self.event("profile", interval=self.profile_interval, samples=sum(stacks.values()),
+                           stacks={stack: count for stack, count in stacks.most_common(200)})
+
+    def stop_sampler(self):
+        # Stop the profiler and write out the samples it took since the last flush
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.join()
+            self.flush_profile()
+            self.sampler = None
+
+    def release(self):
+        # A worker's telemetry at exit: no summary, since the sweeping process writes that
+        self.stop_sampler()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def close(self):
+        self.stop_sampler()
+        self.event("summary", elapsed=time.perf_counter() - self.started, phases=dict(self.phases))
+        self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class RunTelemetry:
+    # Per-run counters, filled in by an InstrumentedSimulation
+    def __init__(self, telemetry, fields):
+        self.telemetry = telemetry
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.phases = Counter()
+        self.steps = 0
+        self.peak_burning = 0
+        self.ignited_total = 0
+        self.ignited_max = 0
+
+    def instrument(self, simulation):
+        self.peak_burning = simulation.burning_count
+        return InstrumentedSimulation(simulation, self)
+
+    def finish(self, burned_cells, steps_taken):
+        self.telemetry.event("run", **self.fields, burned_cells=int(burned_cells), steps_taken=steps_taken,
+                             steps=self.steps, peak_burning=self.peak_burning, ignited_total=self.ignited_total,
+                             ignited_max=self.ignited_max,
+                             ignited_mean=self.ignited_total / self.steps if self.steps else 0.0,
+                             seconds=time.perf_counter() - self.started, phases=dict(self.phases))
+        if self.telemetry.sampler is not None and self.telemetry.sampler.due(self.telemetry.interval):
+            self.telemetry.flush_profile()
+
+class InstrumentedSimulation:
+    # Stands in for an engine's simulation object in its run loop, timing step() and the
+    # burning_count termination check; anything else is passed through
+    def __init__(self, simulation, run):
+        self.simulation = simulation
+        self.run = run
+
+    def __getattr__(self, name):
+        return getattr(self.simulation, name)
+
+    @property
+    def burning_count(self):
+        start = time.perf_counter()
+        count = self.simulation.burning_count
+        self.run.phases["check"] += time.perf_counter() - start
+        return count
+
+    def step(self, rain_active):
+        run = self.run
+        start = time.perf_counter()
+        result = self.simulation.step(rain_active)
+        run.phases["step"] += time.perf_counter() - start
+        run.steps += 1
+        run.peak_burning = max(run.peak_burning, self.simulation.burning_count)
+        run.ignited_total += self.simulation.ignited_count
+        run.ignited_max = max(run.ignited_max, self.simulation.ignited_count)
+        return result
+
+class StackSampler(threading.Thread):
+    # Sampling profiler: every interval seconds, records the stack of the thread that started it
+    # as a collapsed "outer;...;inner" string. Sampling from a side thread leaves the sampled
+    # thread's code untouched; the cost is one stack walk per sample.
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.last_drained = time.perf_counter()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                with self.lock:
+                    self.stacks[";".join(reversed(names))] += 1
+
+    def due(self, interval):
+        return time.perf_counter() - self.last_drained >= interval
+
+    def drain(self):
+        with self.lock:
+            stacks, self.stacks = self.stacks, Counter()
+        self.last_drained = time.perf_counter()
+        return stacks
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from engine import NEIGHBOUR_OFFSETS, cell_uniforms, ignition_probability, new_draw_key, run_loop
+from landscape import ignite_random_fire
+
+# Out-of-core engine for grids larger than memory. State lives in memory-mapped files laid out tile by tile;
+# a step loads only the tiles with fire (and the fuel tiles their fire reaches), exchanges one-cell halos
+# at tile borders, and steps independent tiles concurrently. Ignition draws come from engine.cell_uniforms,
+# so a run matches engine.run_to_completion(..., hashed_draws=True) on the same grid and seed cell for cell.
+
+class TileCells:
+    # Single-cell (row, col) indexing of a tile-major array, as ignite_random_fire uses it
+    def __init__(self, tiles, rows, cols):
+        self.tiles = tiles
+        self.shape = (rows, cols)
+        self.tile_size = tiles.shape[-1]
+
+    def locate(self, index):
+        row, col = index
+        return row // self.tile_size, col // self.tile_size, row % self.tile_size, col % self.tile_size
+
+    def __getitem__(self, index):
+        return self.tiles[self.locate(index)]
+
+    def __setitem__(self, index, value):
+        self.tiles[self.locate(index)] = value
+
+class TiledGrid:
+    # forest and burn_timers as uint8 .npy memory maps of shape (tile_rows, tile_cols, tile_size, tile_size),
+    # so each tile is one contiguous block on disk. Cells past the grid edge are padding in state 0,
+    # which is not fuel and never burns.
+    def __init__(self, directory, mode="r+"):
+        self.directory = directory
+        with open(os.path.join(directory, "grid.json"), encoding="utf-8") as file:
+            layout = json.load(file)
+        self.rows, self.cols, self.tile_size = layout["rows"], layout["cols"], layout["tile_size"]
+        self.forest = np.load(os.path.join(directory, "forest.npy"), mmap_mode=mode)
+        self.burn_timers = np.load(os.path.join(directory, "burn_timers.npy"), mmap_mode=mode)
+        self.tile_rows, self.tile_cols = self.forest.shape[:2]
+
+    @classmethod
+    def create(cls, directory, forest, burn_timers, tile_size=512):
+        # Copy a (possibly memory-mapped) landscape into a new tiled grid, one row of tiles at a time
+        rows, cols = forest.shape
+        tile_rows, tile_cols = -(-rows // tile_size), -(-cols // tile_size)
+        os.makedirs(directory, exist_ok=True)
+        for name, source in (("forest", forest), ("burn_timers", burn_timers)):
+            tiles = np.lib.format.open_memmap(os.path.join(directory, name + ".npy"), mode="w+", dtype=np.uint8,
+                                              shape=(tile_rows, tile_cols, tile_size, tile_size))
+            for tile_row in range(tile_rows):
+                band = np.zeros((tile_size, tile_cols * tile_size), dtype=np.uint8)
+                start, stop = tile_row * tile_size, min((tile_row + 1) * tile_size, rows)
+                band[:stop - start, :cols] = source[start:stop]
+                tiles[tile_row] = band.reshape(tile_size, tile_cols, tile_size).swapaxes(0, 1)
+            tiles.flush()
+            del tiles
+        with open(os.path.join(directory, "grid.json"), "w", encoding="utf-8") as file:
+            json.dump(dict(rows=rows, cols=cols, tile_size=tile_size), file)
+        return cls(directory)
+
+    def tiles(self):
+        return [(tile_row, tile_col) for tile_row in range(self.tile_rows) for tile_col in range(self.tile_cols)]
+
+    def cells(self, tiles):
+        return TileCells(tiles, self.rows, self.cols)
+
+    def to_arrays(self):
+        # Dense (forest, burn_timers) copies, for grids that do fit in memory
+        def dense(tiles):
+            return tiles.swapaxes(1, 2).reshape(self.tile_rows * self.tile_size,
+                                                self.tile_cols * self.tile_size)[:self.rows, :self.cols].copy()
+        return dense(self.forest), dense(self.burn_timers)
+
+    def flush(self):
+        self.forest.flush()
+        self.burn_timers.flush()
+
+def edge(mask, dy, dx):
+    # The strip of a tile's cells on its (dy, dx) side: a row, a column or a corner cell
+    rows = slice(0, 1) if dy == -1 else slice(-1, None) if dy == 1 else slice(None)
+    cols = slice(0, 1) if dx == -1 else slice(-1, None) if dx == 1 else slice(None)
+    return mask[rows, cols]
+
+def halo(dy, dx):
+    # Where the neighbour at (dy, dx) lands in a tile's one-cell padded frame
+    rows = slice(0, 1) if dy == -1 else slice(-1, None) if dy == 1 else slice(1, -1)
+    cols = slice(0, 1) if dx == -1 else slice(-1, None) if dx == 1 else slice(1, -1)
+    return rows, cols
+
+class TiledSimulation:
+    # Steps a TiledGrid in place. A step runs in two phases on a thread pool: the active tiles first
+    # publish which of their cells spread this step (read-only), then every tile that burns or
+    # borders a spreading cell is stepped from its own cells plus the published halos, writing only
+    # to itself. No tile reads another tile's cells while they are being written.
+    def __init__(self, grid, humidity, precipitation_strength, wind_strength, drying_effect, draw_key, workers=None):
+        self.grid = grid
+        self.draw_key = draw_key
+        self.draw_step = 0
+        self.precipitation_strength = precipitation_strength
+        ignition_chance = ignition_probability(humidity, precipitation_strength, wind_strength, drying_effect)
+        self.chance_by_count = 1 - (1 - ignition_chance) ** np.arange(9)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+        # The only pass over every tile: where the fire is and what has already burnt
+        self.active = {}  # (tile_row, tile_col) -> burning cells in the tile
+        self.burned_cells = 0
+        self.ignited_count = 0  # Cells the last step set alight
+        for tile in grid.tiles():
+            forest = grid.forest[tile]
+            burning = int(np.count_nonzero(forest == 2))
+            if burning:
+                self.active[tile] = burning
+            self.burned_cells += int(np.count_nonzero(forest == 5))
+
+    @property
+    def burning_count(self):
+        return sum(self.active.values())
+
+    def spreading(self, tile):
+        # Burning cells whose timer outlasts this step's decrement
+        return (self.grid.forest[tile] == 2) & (self.grid.burn_timers[tile] >= 2)
+
+    def neighbours(self, tile):
+        tile_row, tile_col = tile
+        for dy, dx in NEIGHBOUR_OFFSETS:
+            if 0 <= tile_row + dy < self.grid.tile_rows and 0 <= tile_col + dx < self.grid.tile_cols:
+                yield dy, dx, (tile_row + dy, tile_col + dx)
+
+    def count_neighbours(self, tile, spreading):
+        # Spreading neighbours of every cell of tile, across tile borders
+        size = self.grid.tile_size
+        padded = np.zeros((size + 2, size + 2), dtype=np.uint8)
+        if tile in spreading:
+            padded[1:-1, 1:-1] = spreading[tile]
+        for dy, dx, neighbour in self.neighbours(tile):
+            if neighbour in spreading:
+                padded[halo(dy, dx)] = edge(spreading[neighbour], -dy, -dx)
+        row_sums = padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]
+        counts = row_sums[:-2] + row_sums[1:-1] + row_sums[2:]
+        counts -= padded[1:-1, 1:-1]
+        return counts
+
+    def step_tile(self, tile, spreading, rain_active):
+        # Same update as CompactSimulation.step, on one tile; returns (tile, burning cells, cells burnt out,
+        # cells ignited)
+        forest = np.array(self.grid.forest[tile])
+        timers = np.array(self.grid.burn_timers[tile])
+        burning = forest == 2
+        if rain_active and self.precipitation_strength > 0.6:
+            forest[burning] = 5  # Burnt
+            self.grid.forest[tile] = forest
+            return tile, 0, int(np.count_nonzero(burning)), 0
+
+        timers[burning] -= 1
+        burnt_out = burning & (timers == 0)
+        forest[burnt_out] = 5  # Burnt
+
+        counts = self.count_neighbours(tile, spreading).reshape(-1)
+        candidates = np.flatnonzero(counts)
+        candidate_states = forest.reshape(-1)[candidates]
+        candidates = candidates[(candidate_states == 1) | (candidate_states == 6)]
+        # Draw by global flat index, exactly as the whole-grid step would
+        size = self.grid.tile_size
+        grid_rows = tile[0] * size + candidates // size
+        grid_cols = tile[1] * size + candidates % size
+        draws = cell_uniforms(self.draw_key, self.draw_step, grid_rows * self.grid.cols + grid_cols)
+        ignited = candidates[draws < self.chance_by_count[counts[candidates]]]
+        forest.reshape(-1)[ignited] = 2
+        timers.reshape(-1)[ignited] = 8
+
+        self.grid.forest[tile] = forest
+        self.grid.burn_timers[tile] = timers
+        still_burning = int(np.count_nonzero(burning)) - int(np.count_nonzero(burnt_out)) + ignited.size
+        return tile, still_burning, int(np.count_nonzero(burnt_out)), ignited.size
+
+    def step(self, rain_active):
+        spreading = {}
+        updated = set(self.active)
+        if not (rain_active and self.precipitation_strength > 0.6):
+            spreading = dict(zip(self.active, self.pool.map(self.spreading, self.active)))
+            for tile, mask in spreading.items():
+                for dy, dx, neighbour in self.neighbours(tile):
+                    if neighbour not in updated and edge(mask, dy, dx).any():
+                        updated.add(neighbour)
+
+        self.active = {}
+        self.ignited_count = 0
+        for tile, burning, burnt_out, ignited in self.pool.map(lambda tile: self.step_tile(tile, spreading, rain_active),
+                                                      sorted(updated)):
+            self.burned_cells += burnt_out
+            self.ignited_count += ignited
+            if burning:
+                self.active[tile] = burning
+        self.draw_step += 1
+        return self.burning_count
+
+    def close(self):
+        self.pool.shutdown()
+        self.grid.flush()
+
+def run_to_completion(grid, humidity, precipitation_strength, precipitation_chance, wind_strength, drying_effect, rng,
+                      workers=None, telemetry=None):
+    # engine.run_loop on a TiledGrid, which is stepped in place
+    simulation = TiledSimulation(grid, humidity, precipitation_strength, wind_strength, drying_effect,
+                                 new_draw_key(rng), workers)
+    try:
+        return run_loop(simulation, rng, precipitation_chance, telemetry=telemetry)
+    finally:
+        simulation.close()
+
+def run_on_landscape(forest, burn_timers, humidity, precipitation_strength, precipitation_chance, wind_strength,
+                     drying_effect, rng, tile_size=512, workers=None, directory=None, telemetry=None):
+    # Sweep entry point: copy the read-only (typically memory-mapped) landscape into a scratch TiledGrid
+    # under directory, ignite it from rng and run it, so the landscape never has to be loaded whole
+    scratch = tempfile.mkdtemp(prefix="tiled-", dir=directory)
+    try:
+        grid = TiledGrid.create(scratch, forest, burn_timers, tile_size)
+        ignite_random_fire(grid.cells(grid.forest), grid.cells(grid.burn_timers), rng)
+        return run_to_completion(grid, humidity, precipitation_strength, precipitation_chance, wind_strength,
+                                 drying_effect, rng, workers, telemetry)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
@@ -0,0 +1,85 @@
+import json
+import queue
+import socket
+import threading
+
+# Client of the sweep job server (Simulation_Automated/job_server.py), built for a Tk mainloop:
+# nothing here blocks the calling thread. Requests are queued and written by a background
+# thread that also opens the connection; another thread reads the server's JSON lines into an
+# inbox, which the GUI empties with poll() from a root.after callback.
+
+class JobClient:
+    def __init__(self, host="127.0.0.1", port=8765, timeout=5.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.outbox = queue.Queue()
+        self.inbox = queue.Queue()
+        self.socket = None
+        self.thread = None
+        self.closed = False
+
+    def send(self, request):
+        # Queue request; the first one starts the connection
+        self.outbox.put(request)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.write_requests, daemon=True)
+            self.thread.start()
+
+    def submit(self, spec, results=False):
+        self.send(dict(op="submit", spec=spec, watch=True, results=results))
+
+    def watch(self, job, results=False):
+        self.send(dict(op="watch", job=job, results=results))
+
+    def cancel(self, job):
+        self.send(dict(op="cancel", job=job))
+
+    def jobs(self):
+        self.send(dict(op="jobs"))
+
+    def poll(self):
+        # Every message received since the last call, without waiting
+        messages = []
+        while True:
+            try:
+                messages.append(self.inbox.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def write_requests(self):
+        try:
+            self.socket = socket.create_connection(self.address, timeout=self.timeout)
+            self.socket.settimeout(None)
+        except OSError as error:
+            self.inbox.put(dict(event="disconnected", message=f"Cannot reach the job server at "
+                                                              f"{self.address[0]}:{self.address[1]}: {error}"))
+            return
+        threading.Thread(target=self.read_messages, daemon=True).start()
+        while (request := self.outbox.get()) is not None:
+            try:
+                self.socket.sendall((json.dumps(request) + "\n").encode())
+            except OSError as error:
+                self.inbox.put(dict(event="disconnected", message=str(error)))
+                return
+
+    def read_messages(self):
+        try:
+            with self.socket.makefile("r", encoding="utf-8") as lines:
+                for line in lines:
+                    self.inbox.put(json.loads(line))
+        except (OSError, ValueError) as error:
+            if not self.closed:
+                self.inbox.put(dict(event="disconnected", message=str(error)))
+            return
+        if not self.closed:
+            self.inbox.put(dict(event="disconnected", message="The job server closed the connection."))
+
+    def close(self):
+        self.closed = True
+        self.outbox.put(None)
+        if self.socket is not None:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.socket.close()
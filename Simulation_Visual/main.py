@@ -5,7 +5,9 @@ import matplotlib.colors as mcolors
 import random
 from scipy.ndimage import gaussian_filter
 import tkinter as tk
-from threading import Thread, Event
+from threading import Thread, Event, Lock
+import time
+from job_client import JobClient
 
 # Grid dimensions
 rows, cols = 100, 100
@@ -16,6 +18,19 @@ precipitation_strength = 0.6
 precipitation_chance = 0.7
 wind_strength = 0.2
 
+# Step engine: "vectorized" (whole-array NumPy step) or "legacy" (per-cell Python loop)
+step_engine = "vectorized"
+
+# Highest redraw rate of the grid view; the simulation runs at its own pace and skips frames beyond this
+display_fps = 30
+
+# Local job server (Simulation_Automated/job_server.py) that "Submit Sweep" sends a parameter sweep
+# on a grid of this size to, instead of running it in this process
+job_server_host, job_server_port = "127.0.0.1", 8765
+sweep_values = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]
+sweep_replicas = 1
+job_poll_interval = 0.2  # Seconds between checks for job server messages
+
 # Simulation state
 stop_simulation_event = Event()
 
@@ -26,9 +41,10 @@ initial_burn_timers = None
 total_trees = 0
 
 def initialize_forest(rows, cols):
-    forest = np.random.choice([1, 6], size=(rows, cols), p=[0.6, 0.4])
-    moisture_map = np.random.rand(rows, cols)
-    burn_timers = np.zeros((rows, cols), dtype=int)
+    # Compact layout: uint8 cell states and timers, float32 moisture
+    forest = np.random.choice(np.array([1, 6], dtype=np.uint8), size=(rows, cols), p=[0.6, 0.4])
+    moisture_map = np.random.rand(rows, cols).astype(np.float32)
+    burn_timers = np.zeros((rows, cols), dtype=np.uint8)
     return forest, moisture_map, burn_timers
 
 def add_rock_clusters(forest, num_clusters, max_cluster_size):
@@ -92,28 +108,206 @@ def spread_fire(grid, moisture_map, burn_timers, drying_effect, rain_active):
     new_moisture = np.clip(new_moisture - drying_effect * wind_strength, 0, 1)
     return new_grid, new_moisture, new_burn_timers
 
-def run_simulation(forest, moisture_map, burn_timers, canvas, ax, drying_effect, result_label):
+def count_burning_neighbours(spreading_idx):
+    # Scatter the spreading cells into a zero-padded mask and sum its 8 shifted views,
+    # so cells outside the grid count as not burning
+    padded = np.zeros((rows + 2, cols + 2), dtype=np.uint8)
+    spreading_rows, spreading_cols = np.divmod(spreading_idx, cols)
+    padded[spreading_rows + 1, spreading_cols + 1] = 1
+    counts = np.zeros((rows, cols), dtype=np.uint8)
+    for dy, dx in [(0, 1), (1, 0), (0, -1), (-1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1)]:
+        counts += padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols]
+    return counts
+
+def spread_fire_vectorized(grid, moisture_map, burn_timers, drying_effect, rain_active):
+    global humidity, precipitation_strength, wind_strength
+    new_grid = grid.copy()
+    new_burn_timers = burn_timers.copy()
+    flat_grid = new_grid.reshape(-1)
+    flat_timers = new_burn_timers.reshape(-1)
+    burning_idx = np.flatnonzero(grid == 2)
+
+    if rain_active and precipitation_strength > 0.6:
+        flat_grid[burning_idx] = 5  # Burnt
+    else:
+        flat_timers[burning_idx] -= 1
+        still_burning = flat_timers[burning_idx] > 0
+        flat_grid[burning_idx[~still_burning]] = 5  # Burnt
+
+        # A cell with k still-burning neighbours escapes with (1 - p) ** k, as in the per-cell loop
+        counts = count_burning_neighbours(burning_idx[still_burning]).reshape(-1)
+        reduction_factor = ((humidity + precipitation_strength) * 10) * 5
+        increase_factor = ((wind_strength + drying_effect) * 10) * 3
+        ignition_chance = 0.65 - (reduction_factor / 100) + (increase_factor / 100)
+        ignition_chance = max(0, min(1, ignition_chance))
+        chance_by_count = 1 - (1 - ignition_chance) ** np.arange(9)
+
+        # One batched draw per step, only for fuel cells that have a burning neighbour
+        candidates = np.flatnonzero(counts)
+        candidate_states = grid.reshape(-1)[candidates]
+        candidates = candidates[(candidate_states == 1) | (candidate_states == 6)]
+        draws = np.random.random(candidates.size)
+        ignited = candidates[draws < chance_by_count[counts[candidates]]]
+        flat_grid[ignited] = 2
+        flat_timers[ignited] = 8
+
+    new_moisture = np.subtract(moisture_map, drying_effect * wind_strength)
+    np.clip(new_moisture, 0, 1, out=new_moisture)
+    return new_grid, new_moisture, new_burn_timers
+
+step_engines = {"legacy": spread_fire, "vectorized": spread_fire_vectorized}
+
+# Cell state -> RGBA, the colours of the old ListedColormap/BoundaryNorm pair
+CELL_COLOURS = ['#654321', 'green', 'red', 'blue', 'grey', '#3d251e', '#5fa15f']
+CELL_RGBA = (mcolors.to_rgba_array(CELL_COLOURS) * 255).astype(np.uint8)
+
+class GridRenderer:
+    # Draws the grid through one image artist that is created once and only gets new data. The
+    # simulation thread never touches Tk or matplotlib: it publishes its latest grid into a single
+    # slot, overwriting any frame not yet shown, and the Tk thread picks the slot up at most
+    # display_fps times a second and blits the image and title over a cached background.
+    def __init__(self, root, canvas, ax, result_label):
+        self.root = root
+        self.result_label = result_label
+        self.canvas = canvas
+        self.ax = ax
+        self.figure = ax.figure
+        self.image = ax.imshow(CELL_RGBA[np.zeros((rows, cols), dtype=np.uint8)], interpolation="nearest",
+                               animated=True)
+        self.title = ax.set_title("", animated=True)
+        self.background = None
+        self.lock = Lock()
+        self.pending = None  # (generation, forest, title, result text) not yet shown
+        self.generation = 0  # Bumped by show(), so frames of an abandoned run are ignored
+        canvas.mpl_connect("draw_event", self.on_draw)
+        root.after(0, self.poll)
+
+    def on_draw(self, event):
+        # A full draw (first show, window resize) leaves out animated artists; keep it as the background
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        self.ax.draw_artist(self.image)
+        self.ax.draw_artist(self.title)
+
+    def begin(self):
+        # Generation of a new simulation's frames
+        with self.lock:
+            self.pending = None
+            return self.generation
+
+    def publish(self, generation, forest, title, result_text=None):
+        # Simulation thread: hand over the latest state; cheap and never blocks on drawing. The step
+        # functions return new arrays, so forest is not changed after it is published.
+        with self.lock:
+            if generation == self.generation:
+                self.pending = (generation, forest, title, result_text)
+
+    def show(self, forest, title):
+        # Tk thread: display forest now and drop anything a running simulation has published
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+        self.render(forest, title)
+
+    def render(self, forest, title):
+        self.image.set_data(CELL_RGBA[forest])
+        self.title.set_text(title)
+        if self.background is None:
+            self.canvas.draw()  # Captures the background through on_draw
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_artists()
+        self.canvas.blit(self.figure.bbox)
+
+    def poll(self):
+        with self.lock:
+            frame, self.pending = self.pending, None
+        if frame is not None:
+            _, forest, title, result_text = frame
+            self.render(forest, title)
+            if result_text is not None:
+                self.result_label.config(text=result_text)  # Update results in the secondary window
+        self.root.after(max(1, int(1000 / display_fps)), self.poll)
+
+class JobMonitor:
+    # Follows the sweep jobs submitted to the job server in a label. The JobClient does the
+    # socket work on its own threads; the Tk thread only empties its inbox every job_poll_interval.
+    def __init__(self, root, label):
+        self.root = root
+        self.label = label
+        self.client = None
+        self.job = None
+        self.runs = 0
+        self.burned_total = 0.0  # Sum of % burned over the result rows received
+
+    def submit(self, spec):
+        if self.client is None:
+            self.client = JobClient(job_server_host, job_server_port)
+            self.root.after(0, self.poll)
+        self.job, self.runs, self.burned_total = None, 0, 0.0
+        self.label.config(text="Submitting sweep...")
+        self.client.submit(spec, results=True)
+
+    def cancel(self):
+        if self.client is not None and self.job is not None:
+            self.client.cancel(self.job)
+
+    def poll(self):
+        for message in self.client.poll():
+            self.handle(message)
+            if self.client is None:  # Disconnected; both client threads may have reported it
+                return
+        self.root.after(max(1, int(1000 * job_poll_interval)), self.poll)
+
+    def handle(self, message):
+        kind = message.get("event") or message.get("reply")
+        if kind == "disconnected":
+            self.label.config(text=f"Job server: {message['message']}")
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+            return
+        if kind == "error":
+            self.label.config(text=f"Job server error: {message['message']}")
+            return
+        if kind == "submitted":
+            self.job = message["job"]
+        if message.get("job") != self.job:
+            return
+        if kind == "results":
+            column = message["columns"].index("burned_percentage")
+            self.runs += len(message["results"])
+            self.burned_total += sum(row[column] for row in message["results"])
+            return
+        eta = message.get("eta")
+        text = (f"Sweep job {self.job}: {message['state']} {message['completed']}/{message['total']} runs | "
+                f"{message['rate']:.1f}/s | ETA {'-' if eta is None else time.strftime('%H:%M:%S', time.gmtime(eta))}")
+        if self.runs:
+            text += f"\nMean % burned so far: {self.burned_total / self.runs:.2f}%"
+        if message.get("error"):
+            text += f"\n{message['error']}"
+        self.label.config(text=text)
+
+def run_simulation(forest, moisture_map, burn_timers, renderer, drying_effect):
     
     global total_trees
     global stop_simulation_event
     stop_simulation_event.clear()
+    generation = renderer.begin()
 
     total_trees = np.sum((forest == 1) | (forest == 6))
 
-    cmap = mcolors.ListedColormap(['#654321', 'green', 'red', 'blue', 'grey', '#3d251e', '#5fa15f'])
-    bounds = [-0.5, 0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5]
-    norm = mcolors.BoundaryNorm(bounds, cmap.N)
-
     total_cells = rows * cols
     steps_taken = 0
+    title = ""
 
     while not stop_simulation_event.is_set():
         rain_active = random.random() < precipitation_chance
 
-        ax.clear()
-        ax.imshow(forest, cmap=cmap, norm=norm)
-        ax.set_title(f"Step: {steps_taken} | Rain: {'Yes' if rain_active else 'No'}")
-        canvas.draw()
+        title = f"Step: {steps_taken} | Rain: {'Yes' if rain_active else 'No'}"
+        renderer.publish(generation, forest, title)
 
         steps_taken += 1
 
@@ -121,7 +315,7 @@ def run_simulation(forest, moisture_map, burn_timers, canvas, ax, drying_effect,
             print("Fire has stopped spreading.")
             break
 
-        forest, moisture_map, burn_timers = spread_fire(forest, moisture_map, burn_timers, drying_effect, rain_active)
+        forest, moisture_map, burn_timers = step_engines[step_engine](forest, moisture_map, burn_timers, drying_effect, rain_active)
 
     if stop_simulation_event.is_set():
         print("Simulation was stopped manually.")
@@ -133,7 +327,8 @@ def run_simulation(forest, moisture_map, burn_timers, canvas, ax, drying_effect,
                    f"Total burned m²: {burned_cells}\n"
                    f"% burned: {burned_percentage:.2f}%\n"
                    f"Total steps taken: {steps_taken}")
-    result_label.config(text=result_text)  # Update results in the secondary window
+    # The final frame carries the results, which the Tk thread shows in the secondary window
+    renderer.publish(generation, forest, title, result_text)
 
 def main():
     global initial_forest, initial_moisture_map, initial_burn_timers, results_window, results_label
@@ -146,7 +341,7 @@ def main():
     # Create the secondary results window
     results_window = tk.Toplevel(root)
     results_window.title("Simulation Results")
-    results_window.geometry("400x350")
+    results_window.geometry("400x450")
 
     # Add result labels to the secondary window
     results_label = tk.Label(results_window, text=("Simulation Results:\n"
@@ -197,24 +392,34 @@ def main():
     apply_button = tk.Button(results_window, text="Apply Changes", command=apply_changes, bg="blue", fg="white")
     apply_button.pack(pady=10)
 
+    # Sweeps run on the shared job server; the window only follows their progress
+    job_label = tk.Label(results_window, text="No sweep submitted", bg="white", fg="black", font=("Helvetica", 10),
+                         justify="left")
+    job_label.pack(pady=5)
+    job_monitor = JobMonitor(root, job_label)
+
+    def submit_sweep():
+        job_monitor.submit(dict(rows=rows, cols=cols, values=sweep_values, replicas=sweep_replicas,
+                                name="Simulation_Visual sweep"))
+
+    sweep_buttons = tk.Frame(results_window)
+    sweep_buttons.pack(pady=5)
+    tk.Button(sweep_buttons, text="Submit Sweep", command=submit_sweep, bg="green", fg="white").pack(side=tk.LEFT, padx=5)
+    tk.Button(sweep_buttons, text="Cancel Sweep", command=job_monitor.cancel, bg="orange", fg="white").pack(side=tk.LEFT, padx=5)
+
     fig, ax = plt.subplots(figsize=(8, 8))
     canvas = FigureCanvasTkAgg(fig, master=root)
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 
-    # Define cmap and norm globally for the simulation
-    cmap = mcolors.ListedColormap(['#654321', 'green', 'red', 'blue', 'grey', '#3d251e', '#5fa15f'])
-    bounds = [-0.5, 0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5]
-    norm = mcolors.BoundaryNorm(bounds, cmap.N)
+    # Single image artist shared by the landscape views and the running simulation
+    renderer = GridRenderer(root, canvas, ax, results_label)
 
     def generate_landscape():
         nonlocal forest, moisture_map, burn_timers
         forest, moisture_map, burn_timers = initialize_forest(rows, cols)
         forest = add_rock_clusters(forest, num_clusters=50, max_cluster_size=5)
         forest = add_water_clusters(forest, probability=0.15, sigma=3, threshold=0.2)
-        ax.clear()
-        ax.imshow(forest, cmap=cmap, norm=norm)  # Use cmap and norm here
-        ax.set_title("Generated Landscape")
-        canvas.draw()
+        renderer.show(forest, "Generated Landscape")
 
     def start_simulation():
         nonlocal forest, burn_timers
@@ -226,7 +431,7 @@ def main():
         initial_burn_timers = burn_timers.copy()
 
         forest, burn_timers = ignite_random_fire(forest, burn_timers)
-        simulation_thread = Thread(target=run_simulation, args=(forest, moisture_map, burn_timers, canvas, ax, drying_effect, results_label), daemon=True)
+        simulation_thread = Thread(target=run_simulation, args=(forest, moisture_map, burn_timers, renderer, drying_effect), daemon=True)
         simulation_thread.start()
 
     def restart_simulation():
@@ -238,10 +443,7 @@ def main():
             forest = initial_forest.copy()
             moisture_map = initial_moisture_map.copy()
             burn_timers = initial_burn_timers.copy()
-            ax.clear()
-            ax.imshow(forest, cmap=cmap, norm=norm)  # Use cmap and norm here
-            ax.set_title("Restored Landscape")
-            canvas.draw()
+            renderer.show(forest, "Restored Landscape")
 
     drying_effect = wind_strength
 